@@ -0,0 +1,71 @@
+import json
+import os
+import uuid
+
+import httpx
+
+# ======================================================
+# Chat API Client (used by frontend.py)
+# ======================================================
+# Thin synchronous client for api_server.py. The Streamlit process only
+# renders; the graph, the LLM and the database live behind CHAT_API_URL.
+
+CHAT_API_URL = os.getenv("CHAT_API_URL", "http://localhost:8000")
+# A turn can wait on the LLM and tools for a while between events
+CHAT_API_READ_TIMEOUT = float(os.getenv("CHAT_API_READ_TIMEOUT", "120"))
+
+_client = httpx.Client(
+    base_url=CHAT_API_URL,
+    timeout=httpx.Timeout(10.0, read=CHAT_API_READ_TIMEOUT),
+)
+
+
+def generate_thread_id():
+    # Same format as the server's; no round trip needed for a new chat
+    return str(uuid.uuid4())
+
+
+def load_messages(thread_id):
+    """UI-ready history for a thread: [{"role", "content"}...]."""
+    response = _client.get(f"/threads/{thread_id}/messages")
+    response.raise_for_status()
+    return response.json()["messages"]
+
+
+def get_thread_page(cursor=None, search=None, limit=20):
+    """One sidebar page. Returns ([{"thread_id", "title"}...], next_cursor)."""
+    params = {"limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    if search:
+        params["search"] = search
+    response = _client.get("/threads", params=params)
+    response.raise_for_status()
+    body = response.json()
+    return body["threads"], body["next_cursor"]
+
+
+def send_message(thread_id, user_input):
+    """Run a turn without streaming; returns the answer text."""
+    response = _client.post(f"/threads/{thread_id}/messages", json={"content": user_input})
+    response.raise_for_status()
+    return response.json()["content"]
+
+
+def stream_turn(thread_id, user_input):
+    """
+    Stream one turn as (event, data) pairs from the server-sent events:
+    ("token", {"text"}), ("tool_call", {"name"}), ("tool_result", {"name"}),
+    ("done", {"content"}) or ("error", {"message"}).
+    """
+    with _client.stream("POST", f"/threads/{thread_id}/stream", json={"content": user_input}) as response:
+        response.raise_for_status()
+        event, data = None, []
+        for line in response.iter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+            elif not line and event:
+                yield event, json.loads("\n".join(data))
+                event, data = None, []
@@ -0,0 +1,167 @@
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from langchain_core.messages import AIMessage, ToolMessage
+from pydantic import BaseModel
+
+from init_db import async_pool, async_lock_pool, pool_metrics
+from thread_catalog import alist_threads
+from async_chatbot import get_async_chatbot, astream_turn, aload_messages, ashutdown
+from chatbot import format_msg, generate_thread_id
+from graph_metrics import metrics
+
+# ======================================================
+# Chat API Server (ASGI)
+# ======================================================
+# Runs the async graph in its own service so inference scales independently
+# of the Streamlit UI (frontend.py talks to it through api_client.py):
+#
+#   POST /threads                         -> {"thread_id"}
+#   GET  /threads?cursor=&search=&limit=  -> {"threads": [...], "next_cursor"}
+#   GET  /threads/{id}/messages           -> {"messages": [{"role", "content"}...]}
+#   POST /threads/{id}/messages           -> {"role": "assistant", "content"} (whole answer)
+#   POST /threads/{id}/stream             -> text/event-stream of token / tool_call /
+#                                            tool_result / done / error events
+#   GET  /metrics                         -> Prometheus text (graph + pool metrics)
+#
+#   python api_server.py                  (API_WORKERS processes, default 4)
+#
+# Turns and background summaries of one thread are serialized by a Postgres
+# advisory lock (thread_locks.athread_lock), so any worker or replica can
+# serve any thread and no sticky routing is needed.
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Open the pool, check the schema and compile before taking traffic
+    await get_async_chatbot()
+    yield
+    await ashutdown()
+
+
+app = FastAPI(title="GenAI Chat API", lifespan=lifespan)
+
+
+class TurnRequest(BaseModel):
+    content: str
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    last_updated_at, thread_id = cursor
+    return f"{last_updated_at.isoformat()}|{thread_id}"
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        last_updated_at, thread_id = cursor.split("|", 1)
+        return datetime.fromisoformat(last_updated_at), thread_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def turn_events(thread_id, content):
+    """The turn as (event, data) pairs: tokens, tool activity, then done."""
+    answer = []
+    async for chunk, metadata in astream_turn(thread_id, content):
+        if isinstance(chunk, ToolMessage):
+            yield "tool_result", {"name": chunk.name}
+        elif isinstance(chunk, AIMessage) and metadata.get("langgraph_node") == "chat_node":
+            for tool_call in chunk.tool_calls:
+                if tool_call.get("name"):
+                    yield "tool_call", {"name": tool_call["name"]}
+            text = format_msg(chunk.content)
+            if text:
+                answer.append(text)
+                yield "token", {"text": text}
+    yield "done", {"content": "".join(answer)}
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "pool": pool_metrics(async_pool)}
+
+
+def pool_prometheus():
+    # The lock pool runs dry first when more turns run at once than it has connections
+    pools = [pool_metrics(p) for p in (async_pool, async_lock_pool)]
+    lines = ["# TYPE db_pool_connections gauge"]
+    for m in pools:
+        lines += [f'db_pool_connections{{pool="{m["pool"]}",state="in_use"}} {m["in_use"]}',
+                  f'db_pool_connections{{pool="{m["pool"]}",state="idle"}} {m["idle"]}']
+    lines.append("# TYPE db_pool_requests_waiting gauge")
+    lines += [f'db_pool_requests_waiting{{pool="{m["pool"]}"}} {m["waiting"]}' for m in pools]
+    lines.append("# TYPE db_pool_wait_seconds_total counter")
+    lines += [f'db_pool_wait_seconds_total{{pool="{m["pool"]}"}} {m["wait_ms_total"] / 1000:.3f}' for m in pools]
+    lines.append("# TYPE db_pool_acquire_errors_total counter")
+    lines += [f'db_pool_acquire_errors_total{{pool="{m["pool"]}"}} {m["acquire_errors"]}' for m in pools]
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/metrics")
+async def get_metrics():
+    # Per worker process: Prometheus should scrape each worker (or use one worker per container)
+    return PlainTextResponse(metrics.render_prometheus() + pool_prometheus(),
+                             media_type="text/plain; version=0.0.4")
+
+
+@app.post("/threads")
+async def create_thread():
+    return {"thread_id": generate_thread_id()}
+
+
+@app.get("/threads")
+async def get_threads(cursor: str = None, search: str = None, limit: int = Query(20, ge=1, le=100)):
+    rows, next_cursor = await alist_threads(async_pool, limit=limit,
+                                            cursor=decode_cursor(cursor), search=search or None)
+    threads = [{"thread_id": r["thread_id"], "title": r["title"] or "New Chat"} for r in rows]
+    return {"threads": threads, "next_cursor": encode_cursor(next_cursor)}
+
+
+@app.get("/threads/{thread_id}/messages")
+async def get_messages(thread_id: str):
+    return {"messages": await aload_messages(thread_id)}
+
+
+@app.post("/threads/{thread_id}/messages")
+async def send_message(thread_id: str, request: TurnRequest):
+    async for event, data in turn_events(thread_id, request.content):
+        if event == "done":
+            return {"role": "assistant", "content": data["content"]}
+
+
+@app.post("/threads/{thread_id}/stream")
+async def stream_message(thread_id: str, request: TurnRequest):
+    async def body():
+        try:
+            async for event, data in turn_events(thread_id, request.content):
+                yield sse(event, data)
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            yield sse("error", {"message": str(e)})
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # don't let a reverse proxy buffer the stream
+    })
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api_server:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
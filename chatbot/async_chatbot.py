@@ -0,0 +1,200 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+from langgraph.prebuilt import tools_condition
+from psycopg_pool import PoolTimeout
+
+# Local Imports
+from init_db import async_pool, async_lock_pool, apool_health_checks, DB_POOL_WARMUP, DB_POOL_TIMEOUT, DB_POOL_HEALTH_INTERVAL
+from thread_catalog import asetup_thread_catalog, aupsert_thread, make_title
+from ui_projection import asetup_ui_projection, aupdate_projection, aload_projection
+from tool_runner import ParallelToolRunner
+from schema import aensure_schema
+from graph_metrics import metrics, instrument
+from thread_locks import athread_lock
+from chatbot import (
+    MESSAGE_STORE,
+    checkpoint_serde,
+    schema_version,
+    MessageState,
+    get_llm,
+    get_llm_with_tools,
+    get_tools,
+    build_chat_inputs,
+    aretrieve_context,
+    build_summary_request,
+    report_summary_failure,
+    format_msg,
+    get_config,
+    to_ui_messages,
+)
+from context_assembler import latest_question
+
+# ======================================================
+# Async Graph
+# ======================================================
+# Same graph as chatbot.py, but every node awaits its I/O, so one process can
+# serve many conversations without one blocked thread per user.
+
+async def achat_node(state: MessageState, config: RunnableConfig) -> MessageState:
+    hits = await aretrieve_context(config["configurable"].get("thread_id"), latest_question(state["messages"]))
+    response = await get_llm_with_tools().ainvoke(build_chat_inputs(state, hits))
+    return {"messages": [response]}
+
+
+async def asummarize_messages(state: MessageState, config: RunnableConfig = None):
+    request = build_summary_request(state)
+    if request is None:
+        return {}
+    prompt, end = request
+    response = await get_llm().ainvoke(prompt, config=config)
+    return {"summary": format_msg(response.content), "summarized_upto": end}
+
+
+async def aupdate_thread_catalog(state: MessageState, config: RunnableConfig):
+    messages = state["messages"]
+    thread_id = config["configurable"]["thread_id"]
+    await aupsert_thread(async_pool, thread_id, make_title(messages), len(messages))
+    await aupdate_projection(async_pool, thread_id, messages, config["configurable"].get("checkpoint_map", {}).get(""))
+    return {}
+
+
+def build_async_graph():
+    builder = StateGraph(MessageState)
+    builder.add_node("summarize", asummarize_messages)
+    builder.add_node("chat_node", achat_node)
+    # Tool calls are awaited together (get_stock_price has a native coroutine)
+    builder.add_node("tools", ParallelToolRunner(get_tools()).arun)
+    builder.add_node("update_catalog", aupdate_thread_catalog)
+
+    builder.add_edge(START, "chat_node")
+    builder.add_edge("summarize", END)
+    builder.add_conditional_edges("chat_node", tools_condition, {"tools": "tools", END: "update_catalog"})
+    builder.add_edge("tools", "chat_node")
+    builder.add_edge("update_catalog", END)
+    return builder
+
+
+_async_chatbot = None
+_init_lock = asyncio.Lock()
+_pool_health_task = None
+
+
+async def get_async_chatbot():
+    """Open the async pool, run migrations if the schema is behind and compile the graph (first call only)."""
+    global _async_chatbot, _pool_health_task
+    async with _init_lock:
+        if _async_chatbot is None:
+            try:
+                # Warm-up: wait for min_size connections before serving the first turn
+                await async_pool.open(wait=DB_POOL_WARMUP, timeout=DB_POOL_TIMEOUT)
+            except PoolTimeout:
+                print(f"DB pool warm-up: fewer than {async_pool.min_size} connections after {DB_POOL_TIMEOUT}s")
+            await async_lock_pool.open()
+            if DB_POOL_HEALTH_INTERVAL:
+                _pool_health_task = asyncio.create_task(apool_health_checks(async_pool))
+            if MESSAGE_STORE == "log":
+                from message_log import AsyncMessageLogSaver as saver_cls
+            else:
+                from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver as saver_cls
+            checkpointer = metrics.instrument_checkpointer(saver_cls(async_pool, serde=checkpoint_serde), "chatbot")
+
+            async def setup():
+                await checkpointer.setup()
+                await asetup_thread_catalog(async_pool)
+                await asetup_ui_projection(async_pool)
+
+            # Same version stamp as the sync graph: setup is skipped once the schema is current
+            await aensure_schema(async_pool, f"chatbot:{MESSAGE_STORE}", schema_version(saver_cls), setup)
+            _async_chatbot = build_async_graph().compile(checkpointer=checkpointer)
+    return _async_chatbot
+
+
+# ======================================================
+# Async Entry Points
+# ======================================================
+
+_summary_tasks = set()
+
+
+async def arefresh_summary(thread_id):
+    # Same protocol as chatbot.refresh_summary: the LLM call runs unlocked,
+    # the write is skipped if another refresh moved the watermark meanwhile
+    try:
+        graph = await get_async_chatbot()
+        config = get_config(thread_id)
+        state = await graph.aget_state(config)
+        with metrics.timer("langgraph_node_seconds", graph="chatbot", node="summarize"):
+            llm_config = instrument("chatbot", {"metadata": {"langgraph_node": "summarize"}})
+            update = await asummarize_messages(state.values, llm_config) if state.values else {}
+        if update:
+            async with athread_lock(thread_id):
+                current = (await graph.aget_state(config)).values
+                if current.get("summarized_upto", 0) == state.values.get("summarized_upto", 0):
+                    await graph.aupdate_state(config, update, as_node="summarize")
+    except Exception as e:
+        report_summary_failure(thread_id, e)
+
+
+async def astream_turn(thread_id, user_input):
+    """
+    Async version of chatbot.stream_turn: yields (chunk, metadata) pairs and
+    refreshes the summary in a background task once the answer is done.
+    """
+    graph = await get_async_chatbot()
+    async with athread_lock(thread_id):
+        async for chunk, metadata in graph.astream(
+            {"messages": [HumanMessage(content=user_input)]},
+            config=instrument("chatbot", get_config(thread_id)),
+            stream_mode="messages"
+        ):
+            yield chunk, metadata
+
+    task = asyncio.create_task(arefresh_summary(thread_id))
+    # Keep a reference so the task is not garbage collected mid-flight
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
+
+
+async def aload_messages(thread_id):
+    graph = await get_async_chatbot()
+    ui_messages = await aload_projection(async_pool, thread_id)
+    if ui_messages is not None:
+        return ui_messages
+    state = await graph.aget_state(get_config(thread_id))
+    messages = state.values.get("messages", []) if state.values else []
+    if messages:
+        await aupdate_projection(async_pool, thread_id, messages, state.config["configurable"].get("checkpoint_id"), start=0)
+    return to_ui_messages(messages)
+
+
+async def ashutdown():
+    """Let background summaries finish, then stop health checks and close the pools."""
+    await asyncio.gather(*_summary_tasks, return_exceptions=True)
+    if _pool_health_task is not None:
+        _pool_health_task.cancel()
+    await async_lock_pool.close()
+    await async_pool.close()
+
+
+async def main():
+    """Minimal terminal chat on top of the async graph."""
+    from chatbot import generate_thread_id
+
+    thread_id = generate_thread_id()
+    print(f"Thread {thread_id} (empty line to quit)")
+    while True:
+        user_input = await asyncio.to_thread(input, "you> ")
+        if not user_input.strip():
+            break
+        async for chunk, metadata in astream_turn(thread_id, user_input):
+            if metadata.get("langgraph_node") == "chat_node":
+                print(format_msg(chunk.content), end="", flush=True)
+        print()
+    await ashutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
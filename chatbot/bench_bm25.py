@@ -0,0 +1,124 @@
+"""
+Benchmark: BM25 keyword index build time, memory footprint and query latency,
+plus the cost of the full hybrid search (vector + BM25 + RRF).
+
+    python bench_bm25.py
+    python bench_bm25.py --sizes 10000 100000 300000 --words 120
+
+Documents are synthetic chunks: Zipf-distributed words from a 50k-word
+vocabulary plus ticker symbols and numbers, like financial text. Memory is
+measured with tracemalloc, next to the same postings kept as a dict of
+lists of (doc, tf) tuples for comparison. Hybrid search runs against a
+throwaway local vector index with random embeddings.
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+
+from bench_load import percentile
+from bm25_index import BM25Index, tokenize
+from hybrid_retriever import HybridRetriever
+from vector_index import VectorIndex
+
+VOCAB_SIZE = 50_000
+TICKERS = [f"{a}{b}{c}" for a in "ABCMNTX" for b in "AEIOPRV" for c in "DLNSTY"]
+
+
+def make_corpus(rng, n, words):
+    vocab = [f"w{i}" for i in range(VOCAB_SIZE)]
+    ranks = np.minimum(rng.zipf(1.15, size=(n, words)), VOCAB_SIZE) - 1
+    docs = []
+    for row in ranks:
+        text = [vocab[r] for r in row]
+        text[rng.integers(words)] = TICKERS[rng.integers(len(TICKERS))]
+        text[rng.integers(words)] = f"{rng.integers(1, 1000)}.{rng.integers(0, 100)}"
+        docs.append(" ".join(text))
+    return docs
+
+
+def naive_postings(docs):
+    postings = {}
+    for doc, text in enumerate(docs):
+        for term, tf in Counter(tokenize(text)).items():
+            postings.setdefault(term, []).append((doc, tf))
+    return postings
+
+
+def traced(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--words", type=int, default=120, help="words per chunk")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{args.words} words/chunk, k={args.k}")
+    print(f"{'chunks':>8}{'build s':>9}{'chunks/s':>10}{'terms':>9}{'arrays MB':>11}{'tuples MB':>11}"
+          f"{'bm25 p50':>10}{'bm25 p95':>10}{'hybrid p50':>12}{'hybrid p95':>12}")
+    for n in args.sizes:
+        docs = make_corpus(rng, n, args.words)
+        queries = [" ".join([TICKERS[rng.integers(len(TICKERS))]] + random.Random(i).sample(docs[i % n].split(), 3))
+                   for i in range(args.queries)]
+
+        index = BM25Index()
+        t0 = time.perf_counter()
+        index.add_many(enumerate(docs))
+        build_s = time.perf_counter() - t0
+        # Measured while the structure is still referenced (traced() holds the result)
+        _, arrays_bytes = traced(lambda: _built(docs))
+        _, tuples_bytes = traced(lambda: naive_postings(docs))
+
+        latencies = []
+        for query in queries:
+            t0 = time.perf_counter()
+            index.search(query, args.k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        path = tempfile.mkdtemp(prefix="bm25-bench-")
+        try:
+            vectors = VectorIndex.create(path, args.dim)
+            for start in range(0, n, 50_000):
+                chunk = docs[start:start + 50_000]
+                vectors.add(rng.standard_normal((len(chunk), args.dim), dtype=np.float32),
+                            [{"text": text, "source": "bench"} for text in chunk])
+            retriever = HybridRetriever(vectors, index)
+            retriever.sync(force=True)
+            embeddings = rng.standard_normal((len(queries), args.dim), dtype=np.float32)
+            hybrid = []
+            for query, embedding in zip(queries, embeddings):
+                t0 = time.perf_counter()
+                retriever.search(query, embedding, args.k)
+                hybrid.append((time.perf_counter() - t0) * 1000)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+        print(f"{n:>8}{build_s:>9.2f}{n / build_s:>10.0f}{len(index.vocab):>9}"
+              f"{arrays_bytes / 2**20:>11.1f}{tuples_bytes / 2**20:>11.1f}"
+              f"{percentile(latencies, 50):>10.2f}{percentile(latencies, 95):>10.2f}"
+              f"{percentile(hybrid, 50):>12.2f}{percentile(hybrid, 95):>12.2f}")
+
+
+def _built(docs):
+    index = BM25Index()
+    index.add_many(enumerate(docs))
+    return index
+
+
+if __name__ == "__main__":
+    main()
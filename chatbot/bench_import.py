@@ -0,0 +1,68 @@
+"""
+Benchmark: cold-start cost of the chatbot module.
+
+    python bench_import.py            # 5 fresh interpreters per scenario
+    python bench_import.py --runs 10
+
+Each scenario runs in a new Python process (nothing cached in sys.modules):
+  import         `import chatbot` only (what Streamlit / helper imports pay now)
+  first use      import + get_chatbot(): LLM client, tools, pool, schema check, compile
+                 (what every import used to pay)
+  setup forced   same, with the schema stamp removed so migrations + DDL run again
+Needs the same environment as the app (DB_URI, GOOGLE_API_KEY).
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+IMPORT = """
+import time
+t0 = time.perf_counter()
+import chatbot
+print(time.perf_counter() - t0)
+"""
+
+FIRST_USE = """
+import time
+t0 = time.perf_counter()
+import chatbot
+chatbot.get_chatbot()
+print(time.perf_counter() - t0)
+"""
+
+SETUP_FORCED = """
+import time
+from init_db import get_pool
+with get_pool().connection() as conn:
+    conn.execute("DELETE FROM app_schema_version WHERE component LIKE 'chatbot:%'")
+t0 = time.perf_counter()
+import chatbot
+chatbot.get_chatbot()
+print(time.perf_counter() - t0)
+"""
+
+SCENARIOS = {"import": IMPORT, "first use": FIRST_USE, "setup forced": SETUP_FORCED}
+
+
+def run(code):
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # Warm the OS file cache and stamp the schema before measuring
+    run(FIRST_USE)
+
+    print(f"{'scenario':<16}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for name, code in SCENARIOS.items():
+        timings = [run(code) * 1000 for _ in range(args.runs)]
+        print(f"{name:<16}{statistics.median(timings):>12.1f}{min(timings):>10.1f}{max(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
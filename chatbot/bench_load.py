@@ -0,0 +1,291 @@
+"""
+Load test: the chatbot graph under N concurrent simulated users, offline.
+
+    python bench_load.py                                  # in-memory checkpointer
+    python bench_load.py --users 32 --dsn postgresql://... # real Postgres savers + catalog
+    python bench_load.py --ttft-ms 400 --token-ms 15 --tool-rate 0.4
+
+Gemini is replaced by FakeChatModel (configurable time-to-first-token,
+per-token streaming delay, answer length and tool-call rate) and the tools by
+sleeping stubs with the same names, so only the graph, the checkpointer and
+the database are real. Every user runs its own thread for a random number
+of turns through chatbot.stream_turn (locks + background summaries included).
+
+Reports turns/sec, p50/p95/p99 turn latency and time-to-first-token, and
+per-turn checkpointer time; with --dsn also SQL time and statements per turn
+(statements sent in pipeline mode are timed when queued, not when they run).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.tools import StructuredTool
+
+WORDS = ("stock price market revenue growth quarter analyst earnings forecast "
+         "company share dividend index volatility trend report guidance").split()
+
+
+# ======================================================
+# Fake Model & Stub Tools
+# ======================================================
+
+class FakeChatModel(BaseChatModel):
+    """Streams `answer_tokens` words after `ttft_ms`, one every `token_ms`; sometimes calls a tool first."""
+    ttft_ms: float = 300
+    token_ms: float = 10
+    answer_tokens: int = 120
+    tool_rate: float = 0.3
+    tool_names: list = ["get_stock_price", "duckduckgo_search", "calculator"]
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _tool_call_chunk(self, messages):
+        # Only a fresh user question may trigger a tool, so every turn ends in an answer
+        # (the summarizer's prompt is a lone HumanMessage and never gets one)
+        if len(messages) < 2 or not isinstance(messages[-1], HumanMessage) or random.random() >= self.tool_rate:
+            return None
+        name = random.choice(self.tool_names)
+        args = {"symbol": "AAPL"} if name == "get_stock_price" else (
+            {"first_num": 2, "second_num": 3, "operation": "mul"} if name == "calculator" else {"query": "market news"})
+        return ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+            {"name": name, "args": json.dumps(args), "id": f"call_{uuid.uuid4().hex[:8]}", "index": 0}]))
+
+    def _tokens(self):
+        return [random.choice(WORDS) + " " for _ in range(self.answer_tokens)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.ttft_ms / 1000)
+        tool_call = self._tool_call_chunk(messages)
+        if tool_call:
+            yield tool_call
+            return
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            time.sleep(self.token_ms / 1000)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.ttft_ms / 1000)
+        tool_call = self._tool_call_chunk(messages)
+        if tool_call:
+            yield tool_call
+            return
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.token_ms / 1000)
+
+
+def stub_tools(tool_ms):
+    def sleep():
+        time.sleep(tool_ms / 1000)
+
+    def search(query: str) -> str:
+        sleep()
+        return "Markets closed higher today as " + " ".join(random.choices(WORDS, k=40))
+
+    def stock(symbol: str) -> dict:
+        sleep()
+        return {"Global Quote": {"01. symbol": symbol, "05. price": f"{random.uniform(50, 900):.4f}"}}
+
+    def calculator(first_num: float, second_num: float, operation: str) -> dict:
+        ops = {"add": first_num + second_num, "sub": first_num - second_num, "mul": first_num * second_num}
+        return {"result": ops.get(operation, 0)}
+
+    return [
+        StructuredTool.from_function(search, name="duckduckgo_search", description="Web search"),
+        StructuredTool.from_function(stock, name="get_stock_price", description="Stock price"),
+        StructuredTool.from_function(calculator, name="calculator", description="Arithmetic"),
+    ]
+
+
+# ======================================================
+# Instrumentation
+# ======================================================
+
+class Timings:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkpoint_s = 0.0
+        self.sql_s = 0.0
+        self.statements = 0
+
+    def add(self, field, seconds, statements=0):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + seconds)
+            self.statements += statements
+
+
+timings = Timings()
+
+
+def timed_saver(saver):
+    """Time the checkpointer calls the graph makes on every step."""
+    for name in ("get_tuple", "put", "put_writes"):
+        method = getattr(saver, name)
+
+        def wrapper(*args, _method=method, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                timings.add("checkpoint_s", time.perf_counter() - t0)
+
+        setattr(saver, name, wrapper)
+    return saver
+
+
+def timed_cursor_factory():
+    import psycopg
+
+    class TimedCursor(psycopg.Cursor):
+        def execute(self, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return super().execute(*args, **kwargs)
+            finally:
+                timings.add("sql_s", time.perf_counter() - t0, 1)
+
+        def executemany(self, query, params_seq, **kwargs):
+            params_seq = list(params_seq)
+            t0 = time.perf_counter()
+            try:
+                return super().executemany(query, params_seq, **kwargs)
+            finally:
+                timings.add("sql_s", time.perf_counter() - t0, len(params_seq))
+
+    return TimedCursor
+
+
+# ======================================================
+# Simulated Users
+# ======================================================
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def simulate_user(chatbot, turns, think_ms, results):
+    thread_id = f"load-{uuid.uuid4()}"
+    for _ in range(turns):
+        question = " ".join(random.choices(WORDS, k=random.randint(5, 30))) + "?"
+        t0 = time.perf_counter()
+        first_token = None
+        for chunk, metadata in chatbot.stream_turn(thread_id, question):
+            if (first_token is None and metadata.get("langgraph_node") == "chat_node"
+                    and isinstance(chunk, AIMessage) and chunk.content):
+                first_token = time.perf_counter()
+        done = time.perf_counter()
+        results.append((done - t0, (first_token or done) - t0))
+        if think_ms:
+            time.sleep(random.uniform(0, 2 * think_ms) / 1000)
+    return thread_id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=16, help="concurrent simulated users")
+    parser.add_argument("--min-turns", type=int, default=5)
+    parser.add_argument("--max-turns", type=int, default=25)
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's turns")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--tool-rate", type=float, default=0.3)
+    parser.add_argument("--tool-ms", type=float, default=200)
+    parser.add_argument("--dsn", default=None, help="Postgres DSN; default is an in-memory checkpointer")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.dsn:
+        # init_db reads DB_URI at import time
+        os.environ["DB_URI"] = args.dsn
+    os.environ.setdefault("DB_POOL_MAX_SIZE", str(max(20, args.users + 4)))
+
+    import chatbot
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    fake = FakeChatModel(ttft_ms=args.ttft_ms, token_ms=args.token_ms,
+                         answer_tokens=args.answer_tokens, tool_rate=args.tool_rate)
+    tools = stub_tools(args.tool_ms)
+    # Pre-seed the lazy registry so no real model / search client is ever built
+    chatbot._components.update({"llm": fake, "llm_with_tools": fake, "tools": tools})
+
+    if args.dsn:
+        from init_db import pool
+        pool.kwargs["cursor_factory"] = timed_cursor_factory()
+        checkpointer = chatbot.get_checkpointer()
+        update_catalog = chatbot.update_thread_catalog
+    else:
+        checkpointer = InMemorySaver(serde=chatbot.checkpoint_serde)
+        update_catalog = lambda state, config: {}
+    timed_saver(checkpointer)
+    chatbot._components["chatbot"] = chatbot.build_graph(tools, update_catalog).compile(checkpointer=checkpointer)
+
+    # Thread lengths come from their own generator so they don't depend on the mode
+    plan_rng = random.Random(args.seed)
+    plan = [plan_rng.randint(args.min_turns, args.max_turns) for _ in range(args.users)]
+    results = []
+    print(f"{args.users} users, {sum(plan)} turns ({args.min_turns}-{args.max_turns} per thread), "
+          f"{'postgres' if args.dsn else 'in-memory'} checkpointer, MESSAGE_STORE={chatbot.MESSAGE_STORE}")
+
+    # SQL from setup/warm-up is not part of the turns
+    timings.reset()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        thread_ids = list(executor.map(lambda n: simulate_user(chatbot, n, args.think_ms, results), plan))
+    wall = time.perf_counter() - t0
+    # Background summaries may still be running; they are not part of turn latency
+    chatbot._summary_executor.shutdown(wait=True)
+
+    latencies = [r[0] * 1000 for r in results]
+    ttfts = [r[1] * 1000 for r in results]
+    n = len(results)
+    print(f"\nturns/sec            {n / wall:10.2f}   ({n} turns in {wall:.1f}s)")
+    print(f"{'':<21}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}")
+    for name, values in (("turn latency ms", latencies), ("time to 1st token ms", ttfts)):
+        print(f"{name:<21}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+              f"{percentile(values, 99):>10.1f}{statistics.mean(values):>10.1f}")
+    print(f"checkpointer ms/turn {timings.checkpoint_s * 1000 / n:10.2f}")
+    if args.dsn:
+        print(f"SQL ms/turn          {timings.sql_s * 1000 / n:10.2f}")
+        print(f"statements/turn      {timings.statements / n:10.1f}")
+        for thread_id in thread_ids:
+            checkpointer.delete_thread(thread_id)
+        with pool.connection() as conn:
+            for table in ("thread_catalog", "thread_ui_messages", "thread_ui_state"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ANY(%s)", (thread_ids,))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
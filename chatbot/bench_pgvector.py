@@ -0,0 +1,112 @@
+"""
+Benchmark: pgvector store ingest speed, query latency and recall.
+
+    python bench_pgvector.py --dsn postgresql://...
+    python bench_pgvector.py --dsn postgresql://... --sizes 20000 100000 --ef 40 100 200
+
+Loads synthetic clustered embeddings (see bench_vector_index.py) into a
+scratch table per size: COPY without the index, HNSW build, then COPY into
+the indexed table for the incremental case. Queries run through
+PgVectorStore.top_k at several hnsw.ef_search values, unfiltered and with a
+metadata filter; recall@k is against exact search in NumPy. The scratch
+table is dropped afterwards.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from bench_load import percentile
+from bench_vector_index import synthetic
+
+
+def timed_queries(store, queries, k, filters=None):
+    latencies, results = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        rows = store.top_k(query.tolist(), k, filters)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append([row["id"] for row in rows])
+    return latencies, results
+
+
+def recall(results, truth):
+    return sum(len(set(r) & set(t)) for r, t in zip(results, truth)) / sum(len(t) for t in truth)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", default=os.getenv("DB_URI"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument("--topics", type=int, default=8, help="metadata values used by the filtered queries")
+    args = parser.parse_args()
+    if args.dsn:
+        # init_db reads DB_URI at import time
+        os.environ["DB_URI"] = args.dsn
+
+    import pg_vector_store
+    from init_db import get_pool
+    from pg_vector_store import PgVectorStore
+
+    pool = get_pool()
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim} k={args.k} queries={args.queries}")
+    print(f"{'rows':>8}{'copy rows/s':>13}{'hnsw s':>8}{'indexed rows/s':>16}"
+          f"{'filter':>8}{'ef':>6}{'p50 ms':>8}{'p95 ms':>8}{'recall':>8}")
+    for n in args.sizes:
+        table = f"bench_rag_chunks_{os.getpid()}"
+        store = PgVectorStore(pool, args.dim, table=table)
+        try:
+            data = synthetic(rng, n + args.queries, args.dim, topics=max(16, n // 2000))
+            vectors, queries = data[:n], data[n:]
+            topics = rng.integers(0, args.topics, n)
+            chunks = [{"source": f"doc-{i // 20}", "chunk_index": i % 20, "text": f"chunk {i}",
+                       "metadata": {"topic": int(topics[i])}} for i in range(n)]
+
+            # Bulk load first, then build the graph once
+            store.setup(with_index=False)
+            t0 = time.perf_counter()
+            for start in range(0, n, 5000):
+                store.add(chunks[start:start + 5000], vectors[start:start + 5000].tolist())
+            copy_rate = n / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            store.create_index()
+            hnsw_s = time.perf_counter() - t0
+
+            # Incremental ingest into the indexed table (rows are removed again)
+            extra = min(2000, n)
+            t0 = time.perf_counter()
+            store.add([{**c, "source": "incremental"} for c in chunks[:extra]], vectors[:extra].tolist())
+            indexed_rate = extra / (time.perf_counter() - t0)
+            with pool.connection() as conn:
+                conn.execute(f"DELETE FROM {table} WHERE source = 'incremental'")
+                conn.execute(f"ANALYZE {table}")
+                # BIGSERIAL ids start at 1 in load order
+                first_id = conn.execute(f"SELECT min(id) AS id FROM {table}").fetchone()["id"]
+
+            scores = queries @ vectors.T
+            truth = [(np.argsort(-s)[:args.k] + first_id).tolist() for s in scores]
+            topic = 0
+            masked = np.where(topics == topic, scores, -np.inf)
+            filtered_truth = [(np.argsort(-s)[:args.k] + first_id).tolist() for s in masked]
+
+            for ef in args.ef:
+                pg_vector_store.PG_VECTOR_EF_SEARCH = ef
+                pg_vector_store.PG_VECTOR_FILTERED_EF_SEARCH = ef
+                for label, filters, expected in (("-", None, truth), ("topic", {"topic": topic}, filtered_truth)):
+                    latencies, results = timed_queries(store, queries, args.k, filters)
+                    print(f"{n:>8}{copy_rate:>13.0f}{hnsw_s:>8.2f}{indexed_rate:>16.0f}{label:>8}{ef:>6}"
+                          f"{percentile(latencies, 50):>8.2f}{percentile(latencies, 95):>8.2f}"
+                          f"{recall(results, expected):>8.3f}")
+        finally:
+            with pool.connection() as conn:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+if __name__ == "__main__":
+    main()
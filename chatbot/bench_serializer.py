@@ -0,0 +1,152 @@
+"""
+Benchmark: plain msgpack vs zstd vs zstd + trained dictionary for checkpoints.
+
+    python bench_serializer.py                      # serializer + in-memory get_state
+    python bench_serializer.py --dsn postgresql://... # also end-to-end get_state on Postgres
+
+Synthetic threads mimic the chatbot: user questions, Gemini-style content
+lists, tool calls and JSON tool results.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+
+from serializer import ZstdSerializer, train_dictionary
+
+WORDS = ("stock price market revenue growth quarter analyst earnings forecast "
+         "company share dividend index volatility trend report guidance").split()
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def synthetic_thread(rng, turns):
+    messages = []
+    for _ in range(turns):
+        messages.append(HumanMessage(content=sentence(rng, rng.randint(5, 25)), id=str(uuid.uuid4())))
+        if rng.random() < 0.4:
+            call_id = f"call_{uuid.uuid4().hex[:8]}"
+            symbol = rng.choice(["AAPL", "MSFT", "NVDA", "GOOG"])
+            messages.append(AIMessage(content="", id=str(uuid.uuid4()), tool_calls=[
+                {"name": "get_stock_price", "args": {"symbol": symbol}, "id": call_id}]))
+            quote = {"Global Quote": {"01. symbol": symbol, "05. price": f"{rng.uniform(50, 900):.4f}",
+                                      "06. volume": str(rng.randint(10**5, 10**8)),
+                                      "07. latest trading day": "2026-10-16",
+                                      "10. change percent": f"{rng.uniform(-5, 5):.4f}%"}}
+            messages.append(ToolMessage(content=json.dumps(quote), tool_call_id=call_id,
+                                        name="get_stock_price", id=str(uuid.uuid4())))
+        # Gemini returns a list of content parts
+        messages.append(AIMessage(
+            content=[{"type": "text", "text": " ".join(sentence(rng, 20) for _ in range(rng.randint(2, 8)))}],
+            id=str(uuid.uuid4()),
+        ))
+    return messages
+
+
+def bench_codec(name, serde, threads, repeat=5):
+    sizes, enc, dec = [], [], []
+    for messages in threads:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            typed = serde.dumps_typed(messages)
+            t1 = time.perf_counter()
+            serde.loads_typed(typed)
+            t2 = time.perf_counter()
+            enc.append(t1 - t0)
+            dec.append(t2 - t1)
+        sizes.append(len(typed[1]))
+    return {
+        "codec": name,
+        "avg_bytes": statistics.mean(sizes),
+        "encode_ms": statistics.median(enc) * 1000,
+        "decode_ms": statistics.median(dec) * 1000,
+    }
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def bench_get_state(saver, threads, repeat=20):
+    graph = StateGraph(State)
+    graph.add_node("noop", lambda state: {})
+    graph.add_edge(START, "noop")
+    graph.add_edge("noop", END)
+    app = graph.compile(checkpointer=saver)
+
+    configs = []
+    for messages in threads:
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        app.invoke({"messages": messages}, config)
+        configs.append(config)
+
+    timings = []
+    for _ in range(repeat):
+        for config in configs:
+            t0 = time.perf_counter()
+            app.get_state(config)
+            timings.append(time.perf_counter() - t0)
+    for config in configs:
+        saver.delete_thread(config["configurable"]["thread_id"])
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--dsn", default=None, help="Postgres DSN for end-to-end get_state")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    threads = [synthetic_thread(rng, args.turns) for _ in range(args.threads)]
+    # Train on a separate set of threads, like training on last week's data
+    plain = JsonPlusSerializer()
+    training = [plain.dumps_typed(m)[1] for m in (synthetic_thread(rng, 5) for _ in range(200))]
+    dictionary = train_dictionary(training, size=16 * 1024)
+
+    codecs = {
+        "msgpack": plain,
+        "msgpack+zstd": ZstdSerializer(),
+        "msgpack+zstd+dict": ZstdSerializer(dictionary=dictionary),
+    }
+
+    print(f"{args.threads} threads x {args.turns} turns, "
+          f"~{statistics.mean(len(t) for t in threads):.0f} messages per thread\n")
+    print(f"{'codec':<20}{'avg bytes':>12}{'ratio':>8}{'encode ms':>12}{'decode ms':>12}")
+    base = None
+    for name, serde in codecs.items():
+        r = bench_codec(name, serde, threads)
+        base = base or r["avg_bytes"]
+        print(f"{name:<20}{r['avg_bytes']:>12.0f}{base / r['avg_bytes']:>8.2f}"
+              f"{r['encode_ms']:>12.3f}{r['decode_ms']:>12.3f}")
+
+    print("\nget_state latency (median ms)")
+    for name, serde in codecs.items():
+        print(f"  in-memory  {name:<20}{bench_get_state(InMemorySaver(serde=serde), threads):.3f}")
+
+    if args.dsn:
+        from psycopg.rows import dict_row
+        from psycopg_pool import ConnectionPool
+        from langgraph.checkpoint.postgres import PostgresSaver
+
+        with ConnectionPool(args.dsn, kwargs={"autocommit": True, "row_factory": dict_row}) as pool:
+            PostgresSaver(pool).setup()
+            for name, serde in codecs.items():
+                ms = bench_get_state(PostgresSaver(pool, serde=serde), threads)
+                print(f"  postgres   {name:<20}{ms:.3f}")
+
+
+if __name__ == "__main__":
+    main()
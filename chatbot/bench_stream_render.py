@@ -0,0 +1,89 @@
+"""
+Benchmark: per-chunk st.markdown vs the throttled renderer.
+
+    python bench_stream_render.py
+    python bench_stream_render.py --tokens 3000 --token-ms 10
+
+Replays a synthetic token stream in real time. The render callback costs
+time proportional to the text length, like re-rendering the whole markdown.
+Reports render calls, characters re-rendered (bytes pushed to the browser)
+and the worst delay between a token arriving and it being on screen.
+"""
+import argparse
+import random
+import time
+
+from stream_renderer import ThrottledRenderer
+
+
+class FakePlaceholder:
+    def __init__(self, us_per_kchar):
+        self.us_per_kchar = us_per_kchar
+        self.calls = 0
+        self.chars = 0
+        self.shown_len = 0
+
+    def markdown(self, text):
+        self.calls += 1
+        self.chars += len(text)
+        self.shown_len = len(text)
+        time.sleep(len(text) / 1000 * self.us_per_kchar / 1e6)
+
+
+def replay(tokens, token_ms, make_renderer, us_per_kchar):
+    placeholder = FakePlaceholder(us_per_kchar)
+    renderer = make_renderer(placeholder)
+    # (arrival time, text length after the token) for tokens not yet on screen
+    pending, worst_lag = [], 0.0
+    t0 = time.perf_counter()
+    for token in tokens:
+        time.sleep(token_ms / 1000)
+        pending.append((time.perf_counter(), len(renderer.text) + len(token)))
+        renderer.push(token)
+        now = time.perf_counter()
+        while pending and pending[0][1] <= placeholder.shown_len:
+            worst_lag = max(worst_lag, now - pending.pop(0)[0])
+    renderer.flush()
+    now = time.perf_counter()
+    for arrived, _ in pending:
+        worst_lag = max(worst_lag, now - arrived)
+    return placeholder, worst_lag, time.perf_counter() - t0
+
+
+class EveryChunk:
+    """The old loop: re-render the whole answer on every chunk."""
+
+    def __init__(self, render):
+        self.render, self.text = render, ""
+
+    def push(self, chunk):
+        self.text += chunk
+        self.render(self.text)
+
+    def flush(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1500)
+    parser.add_argument("--token-ms", type=float, default=5, help="delay between streamed tokens")
+    parser.add_argument("--render-us-per-kchar", type=float, default=200, help="render cost per 1000 chars")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tokens = [rng.choice(["the ", "stock ", "market ", "rose ", "by ", "3% ", "today", ". ", "\n\n"]) for _ in range(args.tokens)]
+
+    scenarios = {
+        "every chunk": lambda p: EveryChunk(p.markdown),
+        "throttled": lambda p: ThrottledRenderer(p.markdown),
+    }
+    print(f"{args.tokens} tokens, one every {args.token_ms} ms\n")
+    print(f"{'renderer':<14}{'renders':>9}{'chars sent':>12}{'worst lag ms':>14}{'wall s':>9}")
+    for name, make in scenarios.items():
+        placeholder, lag, wall = replay(tokens, args.token_ms, make, args.render_us_per_kchar)
+        print(f"{name:<14}{placeholder.calls:>9}{placeholder.chars:>12}{lag * 1000:>14.1f}{wall:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: sequential vs parallel tool step.
+
+    python bench_tool_runner.py
+
+Uses stub tools that only sleep, so no network or API keys are needed.
+"""
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from tool_runner import ParallelToolRunner
+
+
+@tool
+def slow_quote(symbol: str) -> dict:
+    """Stub stock quote that takes 300ms."""
+    time.sleep(0.3)
+    return {"symbol": symbol, "price": 100.0}
+
+
+@tool
+def slow_search(query: str) -> str:
+    """Stub web search that takes 500ms."""
+    time.sleep(0.5)
+    return f"results for {query}"
+
+
+@tool
+def stuck_tool(query: str) -> str:
+    """Stub tool that never answers in time."""
+    time.sleep(5)
+    return "too late"
+
+
+def make_state(calls):
+    tool_calls = [
+        {"name": name, "args": args, "id": f"call_{i}", "type": "tool_call"}
+        for i, (name, args) in enumerate(calls)
+    ]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+
+def main():
+    tools = [slow_quote, slow_search, stuck_tool]
+    calls = [
+        ("slow_quote", {"symbol": "AAPL"}),
+        ("slow_quote", {"symbol": "MSFT"}),
+        ("slow_quote", {"symbol": "NVDA"}),
+        ("slow_search", {"query": "market news"}),
+    ]
+    state = make_state(calls)
+    runner = ParallelToolRunner(tools, timeouts={"stuck_tool": 1})
+    by_name = {t.name: t for t in tools}
+
+    start = time.perf_counter()
+    for call in state["messages"][-1].tool_calls:
+        by_name[call["name"]].invoke(call)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = runner.run(state, {})
+    parallel = time.perf_counter() - start
+    order = [m.tool_call_id for m in result["messages"]]
+
+    start = time.perf_counter()
+    asyncio.run(runner.arun(state, {}))
+    parallel_async = time.perf_counter() - start
+
+    start = time.perf_counter()
+    timed_out = runner.run(make_state(calls + [("stuck_tool", {"query": "x"})]), {})
+    with_timeout = time.perf_counter() - start
+
+    print(f"tool calls:           {len(calls)} (slowest 0.50s, sum 1.40s)")
+    print(f"sequential:           {sequential:.2f}s")
+    print(f"parallel (threads):   {parallel:.2f}s")
+    print(f"parallel (asyncio):   {parallel_async:.2f}s")
+    print(f"result order:         {order}")
+    print(f"with 1s-timeout tool: {with_timeout:.2f}s -> {timed_out['messages'][-1].content.splitlines()[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: vector index query latency against corpus size.
+
+    python bench_vector_index.py
+    python bench_vector_index.py --sizes 10000 100000 500000 --dim 768 --nprobe 16
+
+Builds a throwaway index per size from synthetic clustered embeddings (real
+embeddings are clustered by topic, uniform random vectors are not), then
+times single queries and batches with exact search and, after training the
+IVF quantizer, IVF search. Recall@k is IVF against exact search.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import vector_index
+from vector_index import VectorIndex, normalize
+
+
+def synthetic(rng, n, dim, topics):
+    centers = normalize(rng.standard_normal((topics, dim)))
+    rows = centers[rng.integers(0, topics, n)] + rng.standard_normal((n, dim)) * (2.0 / np.sqrt(dim))
+    return normalize(rows)
+
+
+def ms_per_query(index, queries, k, batch, **kwargs):
+    t0 = time.perf_counter()
+    results = []
+    for start in range(0, len(queries), batch):
+        results.extend(index.search(queries[start:start + batch], k, **kwargs))
+    return (time.perf_counter() - t0) * 1000 / len(queries), results
+
+
+def recall(approx, exact):
+    hits = sum(len({r for r, _ in a} & {r for r, _ in e}) for a, e in zip(approx, exact))
+    return hits / sum(len(e) for e in exact)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000, 250_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=vector_index.DEFAULT_NPROBE)
+    args = parser.parse_args()
+
+    # Benchmark IVF at every size
+    vector_index.IVF_MIN_VECTORS = 0
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim} k={args.k} batch={args.batch} nprobe={args.nprobe}, ms per query")
+    print(f"{'vectors':>9}{'add s':>8}{'exact 1':>10}{'exact B':>10}{'train s':>9}{'nlist':>7}"
+          f"{'ivf 1':>9}{'ivf B':>9}{'recall':>8}")
+    for n in args.sizes:
+        path = tempfile.mkdtemp(prefix="vector-index-")
+        try:
+            data = synthetic(rng, n + args.queries, args.dim, topics=max(16, n // 2000))
+            queries = data[n:]
+            index = VectorIndex.create(path, args.dim)
+            t0 = time.perf_counter()
+            for start in range(0, n, 50_000):
+                chunk = data[start:min(n, start + 50_000)]
+                index.add(chunk, [{"text": f"doc {start + i}"} for i in range(len(chunk))])
+            add_s = time.perf_counter() - t0
+
+            exact_1, exact = ms_per_query(index, queries, args.k, 1, exact=True)
+            exact_b, _ = ms_per_query(index, queries, args.k, args.batch, exact=True)
+
+            t0 = time.perf_counter()
+            index.train_ivf()
+            train_s = time.perf_counter() - t0
+            ivf_1, approx = ms_per_query(index, queries, args.k, 1, nprobe=args.nprobe)
+            ivf_b, _ = ms_per_query(index, queries, args.k, args.batch, nprobe=args.nprobe)
+
+            print(f"{n:>9}{add_s:>8.2f}{exact_1:>10.2f}{exact_b:>10.2f}{train_s:>9.2f}"
+                  f"{index.meta['nlist']:>7}{ivf_1:>9.2f}{ivf_b:>9.2f}{recall(approx, exact):>8.3f}")
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
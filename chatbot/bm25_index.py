@@ -0,0 +1,180 @@
+import re
+import sys
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# ======================================================
+# BM25 Keyword Index (in-process)
+# ======================================================
+# Embeddings blur exact tokens: "AAPL", "10-K", "v2.3.1" or "42.7" land
+# near anything vaguely similar. This inverted index scores them exactly.
+#
+# Postings are compact arrays, not lists of tuples: per term one
+# array('I') of internal doc numbers (ascending, since docs are only
+# appended) and one array('I') of term frequencies. Adding a document
+# appends to the arrays of its terms, so the index grows incrementally as
+# chunks are ingested. Scoring reads the arrays as NumPy views (no copy).
+#
+# Callers identify documents by their own key (vector index row, pgvector
+# id); keys must increase with every add so the owner can catch up with
+# "everything after max_key".
+#
+# Postings can't shrink, so delete() only flags documents (one byte each):
+# they score 0 and drop out of the document count and average length.
+# Their terms still count in document frequencies, so the owner rebuilds
+# the index once deleted_fraction grows (see hybrid_retriever.py).
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Lowercased words, numbers and dotted/dashed codes: aapl, 10-k, v2.3.1, 42.7
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1, self.b = k1, b
+        self._lock = threading.Lock()
+        self.vocab = {}        # term -> term number
+        self.postings = []     # term number -> (doc numbers, term frequencies)
+        self.doc_lengths = array("I")
+        self.keys = array("q")
+        self.total_length = 0
+        self.deleted = bytearray()  # doc number -> 1 if deleted
+        self.deleted_count = 0
+        self.deleted_length = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def max_key(self):
+        return self.keys[-1] if self.keys else -1
+
+    @property
+    def live_count(self):
+        return len(self.keys) - self.deleted_count
+
+    @property
+    def deleted_fraction(self):
+        return self.deleted_count / len(self.keys) if self.keys else 0.0
+
+    # np.frombuffer views must not outlive the lock: an array that is exporting
+    # its buffer can't grow, so a concurrent _add would fail halfway through
+    # and leave postings pointing past doc_lengths.
+
+    def live_keys(self):
+        """Keys of the documents not deleted, in order."""
+        with self._lock:
+            return np.frombuffer(self.keys, dtype=np.int64)[~np.frombuffer(self.deleted, dtype=np.bool_)].tolist()
+
+    def add(self, key, text):
+        with self._lock:
+            self._add(key, text)
+
+    def add_many(self, items):
+        """Add (key, text) pairs under one lock acquisition."""
+        with self._lock:
+            for key, text in items:
+                self._add(key, text)
+
+    def _add(self, key, text):
+        if self.keys and key <= self.keys[-1]:
+            raise ValueError(f"BM25 keys must increase: {key} after {self.keys[-1]}")
+        doc = len(self.keys)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            number = self.vocab.get(term)
+            if number is None:
+                number = self.vocab[term] = len(self.postings)
+                self.postings.append((array("I"), array("I")))
+            docs, tfs = self.postings[number]
+            docs.append(doc)
+            tfs.append(tf)
+        length = sum(terms.values())
+        self.doc_lengths.append(length)
+        self.keys.append(key)
+        self.deleted.append(0)
+        self.total_length += length
+
+    def delete(self, keys):
+        """Stop returning these documents; unknown or already deleted keys are ignored."""
+        with self._lock:
+            if not self.keys:
+                return
+            stored = np.frombuffer(self.keys, dtype=np.int64)
+            keys = np.asarray(sorted(set(keys)), dtype=np.int64)
+            docs = np.searchsorted(stored, keys)
+            docs = docs[docs < len(stored)]
+            docs = docs[np.isin(stored[docs], keys)].tolist()
+            del stored
+            for doc in docs:
+                if not self.deleted[doc]:
+                    self.deleted[doc] = 1
+                    self.deleted_count += 1
+                    self.deleted_length += self.doc_lengths[doc]
+
+    def search(self, query, k=10):
+        """Top-k (key, score) for a text query, best first."""
+        with self._lock:
+            if not self.live_count:
+                return []
+            # The views are released when _scores returns, still under the lock
+            scores = self._scores(query)
+            keys = self.keys
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(keys[doc], float(scores[doc])) for doc in matched]
+
+    def _scores(self, query):
+        n = self.live_count
+        avg_length = (self.total_length - self.deleted_length) / n
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        for term in set(tokenize(query)):
+            number = self.vocab.get(term)
+            if number is None:
+                continue
+            docs, tfs = self.postings[number]
+            docs = np.frombuffer(docs, dtype=np.uint32)
+            tfs = np.frombuffer(tfs, dtype=np.uint32).astype(np.float32)
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avg_length)
+            # Doc numbers are unique within one postings list, so += is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        if self.deleted_count:
+            scores[np.frombuffer(self.deleted, dtype=np.bool_)] = 0
+        return scores
+
+    def memory_bytes(self):
+        """Approximate footprint: postings buffers, per-doc arrays and the vocabulary."""
+        postings = sum(docs.buffer_info()[1] * docs.itemsize + tfs.buffer_info()[1] * tfs.itemsize
+                       for docs, tfs in self.postings)
+        per_doc = (len(self.doc_lengths) * self.doc_lengths.itemsize + len(self.keys) * self.keys.itemsize
+                   + len(self.deleted))
+        vocab = sys.getsizeof(self.vocab) + sum(sys.getsizeof(term) for term in self.vocab)
+        # Two array headers per term plus the list holding them
+        containers = sys.getsizeof(self.postings) + len(self.postings) * 2 * sys.getsizeof(array("I"))
+        return postings + per_doc + vocab + containers
+
+
+def rrf_fuse(rankings, k=10, rrf_k=60):
+    """
+    Reciprocal rank fusion: each ranking is a list of keys, best first;
+    a key scores sum(1 / (rrf_k + rank)). Returns [(key, score)...].
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
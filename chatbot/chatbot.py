@@ -1,38 +1,226 @@
 from itertools import count
-import requests
-from typing import Annotated, TypedDict, List
+import asyncio
+import os
+import queue
+from typing import Annotated, TypedDict, List, Optional
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # LangChain Imports
-from langchain_google_genai import ChatGoogleGenerativeAI
+# (the Gemini client, DuckDuckGo and the Postgres savers are imported
+# inside the factories below, so importing this module stays cheap)
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.postgres import PostgresSaver
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_core.tools import tool
-from langchain_core.messages.utils import trim_messages,count_tokens_approximately
+from langgraph.prebuilt import tools_condition
+from langchain_core.tools import tool, StructuredTool
 from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
 
 # Local Imports
-from init_db import pool, STOCK_API_KEY
+from init_db import get_pool, STOCK_API_KEY
+from thread_catalog import setup_thread_catalog, upsert_thread, list_threads, make_title, get_thread_titles
+from stock_quotes import QuoteClient
+from tool_runner import ParallelToolRunner
+from search_cache import SearchCache, cached_search_tool
+from checkpoint_retention import start_retention_worker
+from serializer import make_serializer
+from schema import ensure_schema
+from graph_metrics import metrics, instrument, serve_prometheus
+from ui_projection import setup_ui_projection, update_projection, load_projection, format_msg, to_ui_messages
+from thread_locks import thread_lock
+from context_assembler import (RetrievalCache, assemble_context, latest_question, message_budget, summary_budget,
+                               window_start)
 
 
 # ======================================================
 # Rag implementation
 # ======================================================
+# Our own documents are searched by embedding similarity, from one of two
+# backends (RAG_BACKEND):
+#   local     memory-mapped vector index at RAG_INDEX_PATH (vector_index.py)
+#   pgvector  chunks table in our Postgres, HNSW index (pg_vector_store.py)
+# The retrieval tool is bound to the LLM only when the backend has an index;
+# it embeds the question with the same model the index was built with and
+# returns the best-matching passages. With RAG_HYBRID (default) the vector
+# ranking is fused with BM25 keyword search (hybrid_retriever.py) so exact
+# tickers, code names and numbers are found too.
+
+RAG_BACKEND = os.getenv("RAG_BACKEND", "local")
+RAG_INDEX_PATH = os.getenv("RAG_INDEX_PATH", "rag_index")
+RAG_EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "models/text-embedding-004")
+RAG_EMBEDDING_DIM = int(os.getenv("RAG_EMBEDDING_DIM", "768"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RAG_MAX_TOP_K = int(os.getenv("RAG_MAX_TOP_K", "10"))
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1") == "1"
+# Retrieve for every question and put the excerpts in the prompt (see
+# context_assembler.py); the tool stays available for follow-up searches
+RAG_AUTO_CONTEXT = os.getenv("RAG_AUTO_CONTEXT", "1") == "1"
+
+def get_embeddings():
+    def build():
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=RAG_EMBEDDING_MODEL)
+    return _component("embeddings", build)
+
+def get_doc_index():
+    """The configured retrieval backend; None when there is no local index yet."""
+    def build():
+        if RAG_BACKEND == "pgvector":
+            from init_db import async_pool
+            from pg_vector_store import PgVectorStore
+            store = PgVectorStore(get_pool(), RAG_EMBEDDING_DIM, async_pool=async_pool)
+            store.ensure_schema()
+            return store
+        from vector_index import VectorIndex
+        return VectorIndex(RAG_INDEX_PATH) if VectorIndex.exists(RAG_INDEX_PATH) else None
+    return _component("doc_index", build)
+
+def get_retriever():
+    """Vector search alone, or fused with BM25; None without a document index."""
+    def build():
+        index = get_doc_index()
+        if index is None or not RAG_HYBRID:
+            return index
+        from hybrid_retriever import HybridRetriever
+        return HybridRetriever(index)
+    return _component("retriever", build)
+
+def _retrieval_args(top_k, source):
+    return min(max(top_k, 1), RAG_MAX_TOP_K), ({"source": source} if source else None)
+
+def retrieve_docs(query: str, top_k: int = RAG_TOP_K, source: Optional[str] = None) -> dict:
+    retriever = get_retriever()
+    if retriever is None:
+        return {"error": "No document index available"}
+    k, filters = _retrieval_args(top_k, source)
+    vector = get_embeddings().embed_query(query)
+    if RAG_HYBRID:
+        return {"results": retriever.search(query, vector, k, filters)}
+    return {"results": retriever.search_docs([vector], k, filters=filters)[0]}
+
+async def aretrieve_docs(query: str, top_k: int = RAG_TOP_K, source: Optional[str] = None) -> dict:
+    retriever = get_retriever()
+    if retriever is None:
+        return {"error": "No document index available"}
+    k, filters = _retrieval_args(top_k, source)
+    vector = await get_embeddings().aembed_query(query)
+    if RAG_HYBRID:
+        return {"results": await retriever.asearch(query, vector, k, filters)}
+    if hasattr(retriever, "atop_k"):
+        return {"results": await retriever.atop_k(vector, k, filters)}
+    # The matrix multiply releases the GIL; keep it off the event loop
+    hits = (await asyncio.to_thread(retriever.search_docs, [vector], k, filters=filters))[0]
+    return {"results": hits}
+
+retrieval_tool = StructuredTool.from_function(
+    func=retrieve_docs,
+    coroutine=aretrieve_docs,
+    name="search_documents",
+    description="Search the internal document collection and return the top_k most relevant passages "
+                "with their source; optionally restrict to one source document. Prefer this over web "
+                "search for questions about our own documents.",
+)
 
+# Per (thread, question): chat_node runs again after each tool round of a turn
+retrieval_cache = RetrievalCache()
+
+def _search(retriever, question, vector, k):
+    if RAG_HYBRID:
+        return retriever.search(question, vector, k)
+    return retriever.search_docs([vector], k)[0]
+
+def _retrieval_failed():
+    # Answer without excerpts rather than fail the turn; not cached, so the next round retries
+    metrics.count("langgraph_errors_total", 1, {"graph": "chatbot", "kind": "retrieval", "name": "auto_context"})
+    return []
+
+def retrieve_context(thread_id, question):
+    """Chunks for the question being answered, cached; [] without an index."""
+    if not RAG_AUTO_CONTEXT or not question:
+        return []
+    hits = retrieval_cache.get(thread_id, question)
+    if hits is None:
+        try:
+            retriever = get_retriever()
+            hits = _search(retriever, question, get_embeddings().embed_query(question), RAG_TOP_K) if retriever else []
+        except Exception:
+            return _retrieval_failed()
+        retrieval_cache.put(thread_id, question, hits)
+    return hits
+
+async def aretrieve_context(thread_id, question):
+    if not RAG_AUTO_CONTEXT or not question:
+        return []
+    hits = retrieval_cache.get(thread_id, question)
+    if hits is None:
+        try:
+            retriever = get_retriever()
+            hits = []
+            if retriever is not None:
+                vector = await get_embeddings().aembed_query(question)
+                if RAG_HYBRID:
+                    hits = await retriever.asearch(question, vector, RAG_TOP_K)
+                elif hasattr(retriever, "atop_k"):
+                    hits = await retriever.atop_k(vector, RAG_TOP_K)
+                else:
+                    hits = await asyncio.to_thread(_search, retriever, question, vector, RAG_TOP_K)
+        except Exception:
+            return _retrieval_failed()
+        retrieval_cache.put(thread_id, question, hits)
+    return hits
 
 
-
+# ======================================================
+# 0. Lazy Components
+# ======================================================
+# The LLM client, the tools, the checkpointer (with its migrations) and the
+# compiled graph are built on first use, not at import time. Streamlit
+# restarts and scripts that only need a helper (format_msg, MessageState...)
+# no longer pay for all of it. `from chatbot import chatbot` (or llm, tools...)
+# still works and builds that component on access.
+
+_components = {}
+_components_lock = threading.RLock()
+
+def _component(name, factory):
+    if name not in _components:
+        with _components_lock:
+            if name not in _components:
+                _components[name] = factory()
+    return _components[name]
+
+def __getattr__(name):
+    factories = {
+        "chatbot": get_chatbot,
+        "checkpointer": get_checkpointer,
+        "llm": get_llm,
+        "llm_with_tools": get_llm_with_tools,
+        "tools": get_tools,
+        "search_tool": get_search_tool,
+        "embeddings": get_embeddings,
+        "doc_index": get_doc_index,
+        "retriever": get_retriever,
+        "pool": get_pool,
+    }
+    if name in factories:
+        return factories[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ======================================================
 # 1. Tool Definitions
 # ======================================================
 
-search_tool = DuckDuckGoSearchRun(region="us-en")
+# Same DuckDuckGo tool behind a normalized-query cache; search_cache.stats() has hit/miss counters
+search_cache = SearchCache()
+
+def get_search_tool():
+    def build():
+        from langchain_community.tools import DuckDuckGoSearchRun
+        return cached_search_tool(DuckDuckGoSearchRun(region="us-en"), search_cache)
+    return _component("search_tool", build)
 
 @tool
 def calculator(first_num: float, second_num: float, operation: str) -> dict:
@@ -49,102 +237,221 @@ def calculator(first_num: float, second_num: float, operation: str) -> dict:
     except Exception as e:
         return {"error": str(e)}
 
-@tool
-def get_stock_price(symbol: str) -> dict:
-    """Fetch latest stock price for a symbol (e.g. 'AAPL') via Alpha Vantage."""
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={STOCK_API_KEY}"
-    r = requests.get(url)
-    return r.json()
+# Shared pooled HTTP client with a per-symbol TTL cache (see stock_quotes.py)
+quote_client = QuoteClient(STOCK_API_KEY)
 
-tools = [search_tool, get_stock_price, calculator]
+def fetch_stock_price(symbol: str) -> dict:
+    return quote_client.get_quote(symbol)
+
+async def afetch_stock_price(symbol: str) -> dict:
+    # Used by the async graph (async_chatbot.py) so the event loop never blocks
+    return await quote_client.aget_quote(symbol)
+
+get_stock_price = StructuredTool.from_function(
+    func=fetch_stock_price,
+    coroutine=afetch_stock_price,
+    name="get_stock_price",
+    description="Fetch latest stock price for a symbol (e.g. 'AAPL') via Alpha Vantage.",
+)
+
+def get_tools():
+    def build():
+        tools = [get_search_tool(), get_stock_price, calculator]
+        if get_doc_index() is not None:
+            tools.append(retrieval_tool)
+        return tools
+    return _component("tools", build)
 
 # ======================================================
 # 2. Model & Graph Setup
 # ======================================================
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    max_output_tokens=500,  # <--- SET LIMIT HERE (e.g., 500 words/tokens)
-    temperature=0.7         # Optional: Controls creativity (0.0 = Precise, 1.0 = Creative)
-)
-llm_with_tools = llm.bind_tools(tools)
+def get_llm():
+    def build():
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash",
+            max_output_tokens=500,  # <--- SET LIMIT HERE (e.g., 500 words/tokens)
+            temperature=0.7         # Optional: Controls creativity (0.0 = Precise, 1.0 = Creative)
+        )
+    return _component("llm", build)
+
+def get_llm_with_tools():
+    return _component("llm_with_tools", lambda: get_llm().bind_tools(get_tools()))
 
 class MessageState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
     summary:str
+    summarized_upto: int  # messages[:summarized_upto] are already folded into summary
 
 
 MAX_TOKEN=1000
 
+# Whatever falls out of chat_node's prompt window has to be in the summary.
+# The summary is refreshed once unsummarized history no longer fits in half
+# of the window the messages are guaranteed (message_budget), and then folds
+# in everything but the newest quarter, so the next turn still fits before
+# the next refresh and short turns do not need a summarizer call each.
+SUMMARY_TRIGGER_SHARE = 0.5
+SUMMARY_KEEP_SHARE = 0.25
 
-def summarize_messages(state: MessageState):
-    summary = state.get("summary", "")
-    messages = state["messages"]
-    
-    # Only summarize if we have more than, say, 10 messages
-    if len(messages) > 10:
-        # We summarize everything EXCEPT the last 5 messages 
-        # (to keep the current conversation flow perfectly clear)
-        to_summarize = messages[:-5]
-        
-        summary_prompt = (
-            f"Extend the current summary by incorporating the new messages below: {summary}\n\n"
-            f"New messages to summarize: {to_summarize}"
-        )
-        
-        # Call LLM to create the summary
-        response = llm.invoke([HumanMessage(content=summary_prompt)])
-        print(f"Response summary",response.content)
-        
-        # We return the NEW summary. 
-        # IMPORTANT: We do NOT delete messages here so they stay in UI.
-        return {"summary": response.content}
-    
-    return {"summary": summary}
+
+def render_for_summary(messages):
+    """Plain "Role: text" transcript for the summarizer (not the Python repr)."""
+    lines = []
+    for m in messages:
+        text = format_msg(m.content)
+        if not text:
+            continue
+        if isinstance(m, HumanMessage):
+            role = "User"
+        elif isinstance(m, ToolMessage):
+            role = f"Tool ({m.name})"
+        else:
+            role = "Assistant"
+        lines.append(f"{role}: {text}")
+    return "\n".join(lines)
 
 
-def chat_node(state: MessageState) -> MessageState:
+def build_summary_request(state: MessageState):
+    """
+    Returns (prompt_messages, new_watermark), or None while the
+    unsummarized history still fits in the prompt window. Shared by the sync
+    and async graphs.
+    """
     summary = state.get("summary", "")
+    messages = state["messages"]
     
-    # VIRTUAL TRIM: Only grab the most recent messages for the LLM
-    # This does NOT delete them from Postgres/State.
-    recent_messages = trim_messages(
-        state['messages'],
-        strategy="last",
-        token_counter=count_tokens_approximately,
-        max_tokens=1000, 
-        start_on="human",
-        include_system=True
+    # Watermark: everything before it is already in the summary
+    start = state.get("summarized_upto", 0)
+    window = message_budget(MAX_TOKEN)
+    if window_start(messages, int(window * SUMMARY_TRIGGER_SHARE)) <= start:
+        return None
+    end = window_start(messages, int(window * SUMMARY_KEEP_SHARE))
+
+    new_messages = messages[start:end]
+
+    # Only the delta + previous summary go to the LLM, so the call stays
+    # the same size no matter how long the thread gets.
+    # The prompt only has room for summary_budget tokens of summary: ask for
+    # that, so older details get condensed instead of the newest being cut off
+    summary_prompt = (
+        f"Extend the current summary by incorporating the new messages below: {summary}\n\n"
+        f"New messages to summarize:\n{render_for_summary(new_messages)}\n\n"
+        f"Keep the whole summary under {summary_budget(MAX_TOKEN)} tokens. If it would be longer, "
+        f"condense the older parts and keep the details of the new messages."
     )
+    return [HumanMessage(content=summary_prompt)], end
 
-    # Combine Summary (as a System Message) + Recent Messages
-    inputs = []
-    if summary:
-        inputs.append(SystemMessage(content=f"Summary of previous conversation: {summary}"))
-    
-    inputs.extend(recent_messages)
 
-    response = llm_with_tools.invoke(inputs)
-    return {"messages": [response]}
+def summarize_messages(state: MessageState, config: RunnableConfig = None):
+    request = build_summary_request(state)
+    if request is None:
+        return {}
+    prompt, end = request
+    
+    # Call LLM to create the summary
+    response = get_llm().invoke(prompt, config=config)
+    
+    # We return the NEW summary. 
+    # IMPORTANT: We do NOT delete messages here so they stay in UI.
+    return {"summary": format_msg(response.content), "summarized_upto": end}
 
-tool_node = ToolNode(tools)
 
-builder = StateGraph(MessageState)
-builder.add_node("summarize", summarize_messages) # New Node
-builder.add_node("chat_node", chat_node)
-builder.add_node("tools", tool_node)
+def build_chat_inputs(state: MessageState, hits=None):
+    # VIRTUAL TRIM: Only grab the most recent messages for the LLM
+    # This does NOT delete them from Postgres/State.
+    # Summary, retrieved chunks and recent messages share one MAX_TOKEN budget
+    # (see context_assembler.py); token counts are cached per message id.
+    return assemble_context(state.get("summary", ""), state["messages"], hits, MAX_TOKEN)
 
-builder.add_edge(START, "summarize") # Summarize first
-builder.add_edge("summarize", "chat_node") # Then chat
-builder.add_conditional_edges("chat_node", tools_condition)
-builder.add_edge("tools", "chat_node")
-builder.add_edge("chat_node", END)
 
-checkpointer = PostgresSaver(pool)
+def chat_node(state: MessageState, config: RunnableConfig) -> MessageState:
+    hits = retrieve_context(config["configurable"].get("thread_id"), latest_question(state["messages"]))
+    response = get_llm_with_tools().invoke(build_chat_inputs(state, hits))
+    return {"messages": [response]}
 
-checkpointer.setup()
 
-chatbot = builder.compile(checkpointer=checkpointer)
+def update_thread_catalog(state: MessageState, config: RunnableConfig):
+    # Keep the sidebar catalog in sync so it never has to scan checkpoints
+    messages = state["messages"]
+    thread_id = config["configurable"]["thread_id"]
+    upsert_thread(get_pool(), thread_id, make_title(messages), len(messages))
+    # Extend the stored UI projection with just this turn's messages
+    update_projection(get_pool(), thread_id, messages, config["configurable"].get("checkpoint_map", {}).get(""))
+    return {}
+
+def build_graph(tools=None, update_catalog=update_thread_catalog):
+    """`tools` / `update_catalog` can be swapped out (bench_load.py runs the graph without Postgres)."""
+    builder = StateGraph(MessageState)
+    builder.add_node("summarize", summarize_messages) # Written by the background summarizer only
+    builder.add_node("chat_node", chat_node)
+    # All tool calls of one AI message run concurrently (see tool_runner.py)
+    builder.add_node("tools", ParallelToolRunner(tools if tools is not None else get_tools()).run)
+    builder.add_node("update_catalog", update_catalog)
+
+    # Summarization is NOT on the turn path any more: the answer starts right away
+    # and the summary is refreshed in the background after the turn (see section 4).
+    builder.add_edge(START, "chat_node")
+    builder.add_edge("summarize", END)
+    builder.add_conditional_edges("chat_node", tools_condition, {"tools": "tools", END: "update_catalog"})
+    builder.add_edge("tools", "chat_node")
+    builder.add_edge("update_catalog", END)
+    return builder
+
+# MESSAGE_STORE=log keeps messages in an append-only table instead of
+# re-saving the whole conversation in every checkpoint (see message_log.py)
+MESSAGE_STORE = os.getenv("MESSAGE_STORE", "checkpoint")
+
+# zstd-compressed msgpack for blobs/writes; older uncompressed rows still load
+checkpoint_serde = make_serializer()
+
+# Bump when setup_thread_catalog / setup_ui_projection / the message log change
+APP_SCHEMA_VERSION = 2
+
+def schema_version(saver_cls):
+    """Our tables' version + the saver's migration count (a LangGraph upgrade re-runs setup)."""
+    return f"{APP_SCHEMA_VERSION}.{len(saver_cls.MIGRATIONS)}"
+
+def get_checkpointer():
+    def build():
+        if MESSAGE_STORE == "log":
+            from message_log import MessageLogSaver as saver_cls
+        else:
+            from langgraph.checkpoint.postgres import PostgresSaver as saver_cls
+        pool = get_pool()
+        checkpointer = saver_cls(pool, serde=checkpoint_serde)
+
+        def setup():
+            checkpointer.setup()
+            setup_thread_catalog(pool)
+            setup_ui_projection(pool)
+
+        # One SELECT instead of the migrations + DDL when the schema is current
+        ensure_schema(pool, f"chatbot:{MESSAGE_STORE}", schema_version(saver_cls), setup)
+        # Checkpoint read/write time per turn (see graph_metrics.py)
+        return metrics.instrument_checkpointer(checkpointer, "chatbot")
+    return _component("checkpointer", build)
+
+def get_chatbot():
+    """The compiled graph, built on first call."""
+    def build():
+        chatbot = build_graph().compile(checkpointer=get_checkpointer())
+
+        # Optional in-process compaction, e.g. CHECKPOINT_RETENTION_INTERVAL=3600
+        # (or run checkpoint_retention.py as a separate job)
+        if os.getenv("CHECKPOINT_RETENTION_INTERVAL"):
+            start_retention_worker(
+                get_pool(),
+                interval=float(os.getenv("CHECKPOINT_RETENTION_INTERVAL")),
+                keep=int(os.getenv("CHECKPOINT_RETENTION_KEEP", "5")),
+                ttl_days=float(os.getenv("THREAD_TTL_DAYS")) if os.getenv("THREAD_TTL_DAYS") else None,
+            )
+        # e.g. GRAPH_METRICS_PORT=9464 -> Prometheus scrapes http://host:9464/metrics
+        if os.getenv("GRAPH_METRICS_PORT"):
+            serve_prometheus(int(os.getenv("GRAPH_METRICS_PORT")))
+        return chatbot
+    return _component("chatbot", build)
 
 # ======================================================
 # 3. Helper Functions (Used by UI)
@@ -156,70 +463,121 @@ def generate_thread_id():
 def get_config(thread_id):
     return {"configurable": {"thread_id": thread_id}}
 
-def format_msg(content):
+def load_messages_from_langgraph(thread_id):
     """
-    CLEANER FUNCTION:
-    - Handles standard strings.
-    - Handles Gemini's list of dicts [{'type': 'text', 'text': ...}].
+    UI-ready history for a thread (role + clean text, no ToolMessages).
+    Read from the stored projection; threads without one are projected
+    from the checkpoint once and stored.
     """
-    if isinstance(content, str):
-        return content
-    elif isinstance(content, list):
-        # Extract text from the messy list
-        text_parts = []
-        for item in content:
-            if isinstance(item, str):
-                text_parts.append(item)
-            elif isinstance(item, dict):
-                if "text" in item:
-                    text_parts.append(item["text"])
-        return "".join(text_parts)
-    return ""
-
-def load_messages_from_langgraph(thread_id):
+    if not thread_id:
+        return []
+    ui_messages = load_projection(get_pool(), thread_id)
+    if ui_messages is not None:
+        return ui_messages
+
+    state = get_chatbot().get_state(config=get_config(thread_id))
+    messages = state.values.get("messages", []) if state.values else []
+    if messages:
+        update_projection(get_pool(), thread_id, messages, state.config["configurable"].get("checkpoint_id"), start=0)
+    return to_ui_messages(messages)
+
+def get_thread_page(cursor=None, search=None, limit=20):
     """
-    Fetch history from DB, but CLEAN it before returning.
-    Removes ToolMessages and formats messy text.
+    One sidebar page from the catalog, most recently active first.
+    Returns ([{"thread_id", "title"}...], next_cursor).
     """
-    if thread_id:
-        state = chatbot.get_state(config=get_config(thread_id)) 
-    # print("State",state)
-    if state:
-        messages = state.values.get("messages", []) if state.values else []
+    rows, next_cursor = list_threads(get_pool(), limit=limit, cursor=cursor, search=search)
+    page = [{"thread_id": r["thread_id"], "title": r["title"] or "New Chat"} for r in rows]
+    return page, next_cursor
 
-    ui_messages = []
-    for m in messages:
-        # 1. Skip technical ToolMessages
-        if isinstance(m, ToolMessage):
-            continue
-        
-        # 2. Skip empty tool calls
-        if isinstance(m, AIMessage) and m.tool_calls and not m.content:
-            continue
-
-        role = "user" if isinstance(m, HumanMessage) else "assistant"
-        
-        # 3. Clean the content
-        clean_content = format_msg(m.content)
-        
-        if clean_content:
-            ui_messages.append({"role": role, "content": clean_content})
-            
-    return ui_messages
-
-def get_all_thread_ids():
-    """List all threads from Postgres."""
-    config_list = checkpointer.list(None)
-    thread_ids = set()
-    for item in config_list:
-        thread_ids.add(item.config["configurable"]["thread_id"])
-    return list(thread_ids)
+def get_thread_titles_bulk(thread_ids):
+    """Titles for many threads in one round trip (thread_id -> title)."""
+    return get_thread_titles(get_pool(), thread_ids)
 
 def get_thread_title(thread_id):
     """Get a simple title based on the first user message."""
-    state = chatbot.get_state(config=get_config(thread_id))
-    messages = state.values.get("messages", [])
-    for m in messages:
-        if isinstance(m, HumanMessage):
-            return (m.content[:20] + "...") if len(m.content) > 20 else m.content
-    return "New Chat"
\ No newline at end of file
+    return get_thread_titles_bulk([thread_id])[thread_id]
+
+
+# ======================================================
+# 4. Background Summarization
+# ======================================================
+
+# Turns and summary writes on the same thread are serialized by thread_lock
+# (thread_locks.py); the summarizer's LLM call itself runs unlocked.
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summarizer")
+_summaries_pending = set()
+_summaries_lock = threading.Lock()
+
+def report_summary_failure(thread_id, error):
+    # Runs in a background thread; nobody would see the exception otherwise
+    metrics.count("langgraph_errors_total", 1, {"graph": "chatbot", "kind": "summary", "name": "refresh"})
+    print(f"Summary refresh failed for thread {thread_id}: {error!r}")
+
+def refresh_summary(thread_id):
+    """Fold new messages into the thread summary and save it as a 'summarize' checkpoint."""
+    try:
+        config = get_config(thread_id)
+        chatbot = get_chatbot()
+        state = chatbot.get_state(config)
+        # Runs outside the graph, so it is timed as the "summarize" node here.
+        # No lock yet: the user's next turn must not wait for this LLM call
+        with metrics.timer("langgraph_node_seconds", graph="chatbot", node="summarize"):
+            llm_config = instrument("chatbot", {"metadata": {"langgraph_node": "summarize"}})
+            update = summarize_messages(state.values, llm_config) if state.values else {}
+        if update:
+            with thread_lock(thread_id):
+                # Turns only append messages, so the summary still fits unless
+                # another refresh has moved the watermark in the meantime
+                current = chatbot.get_state(config).values
+                if current.get("summarized_upto", 0) == state.values.get("summarized_upto", 0):
+                    # The next turn reads the refreshed summary from this checkpoint
+                    chatbot.update_state(config, update, as_node="summarize")
+    except Exception as e:
+        report_summary_failure(thread_id, e)
+    finally:
+        with _summaries_lock:
+            _summaries_pending.discard(thread_id)
+
+def schedule_summary(thread_id):
+    """Queue a summary refresh unless one is already pending for this thread."""
+    with _summaries_lock:
+        if thread_id in _summaries_pending:
+            return
+        _summaries_pending.add(thread_id)
+    _summary_executor.submit(refresh_summary, thread_id)
+
+_TURN_DONE = object()
+
+def _run_turn(thread_id, user_input, chunks):
+    # The whole turn runs here under the thread lock, so the lock is released
+    # when the graph finishes, not when (or if) the consumer stops reading
+    try:
+        with thread_lock(thread_id):
+            for item in get_chatbot().stream(
+                {"messages": [HumanMessage(content=user_input)]},
+                # Per-node / LLM / tool timings and token counts (graph_metrics.py)
+                config=instrument("chatbot", get_config(thread_id)),
+                stream_mode="messages"
+            ):
+                chunks.put(item)
+        schedule_summary(thread_id)
+    except Exception as e:
+        chunks.put(e)
+    finally:
+        chunks.put(_TURN_DONE)
+
+def stream_turn(thread_id, user_input):
+    """
+    Stream one turn as (chunk, metadata) pairs, like chatbot.stream(..., stream_mode="messages").
+    The turn runs to completion in a worker thread even if the caller stops
+    iterating (Streamlit rerun, client gone); the summary refresh is queued
+    after it has finished.
+    """
+    chunks = queue.Queue()
+    threading.Thread(target=_run_turn, args=(thread_id, user_input, chunks),
+                     name="turn", daemon=True).start()
+    while (item := chunks.get()) is not _TURN_DONE:
+        if isinstance(item, Exception):
+            raise item
+        yield item
@@ -0,0 +1,189 @@
+import argparse
+import threading
+import time
+from dataclasses import dataclass, asdict
+
+# ======================================================
+# Checkpoint Retention / Compaction
+# ======================================================
+# Every turn writes several checkpoints and nothing ever removes them. This job:
+#   1. keeps only the newest `keep` checkpoints per thread (the latest is always kept)
+#   2. deletes checkpoint_writes / checkpoint_blobs no remaining checkpoint refers to
+#   3. optionally drops whole threads idle for longer than a TTL
+# Threads are taken from thread_catalog in batches, with a pause in between,
+# and threads active within `grace` are skipped so in-flight turns are never touched.
+
+# Next batch of threads idle for longer than the grace window
+THREAD_BATCH_SQL = """
+SELECT thread_id, last_updated_at < now() - %s * interval '1 day' AS expired
+FROM thread_catalog
+WHERE thread_id > %s AND last_updated_at < now() - %s * interval '1 second'
+ORDER BY thread_id
+LIMIT %s
+"""
+
+PRUNE_CHECKPOINTS_SQL = """
+WITH ranked AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id,
+           row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn
+    FROM checkpoints
+    WHERE thread_id = ANY(%s)
+), deleted AS (
+    DELETE FROM checkpoints c
+    USING ranked r
+    WHERE c.thread_id = r.thread_id
+      AND c.checkpoint_ns = r.checkpoint_ns
+      AND c.checkpoint_id = r.checkpoint_id
+      AND r.rn > %s
+    RETURNING pg_column_size(c.*) AS bytes
+)
+SELECT count(*) AS n, COALESCE(sum(bytes), 0) AS bytes FROM deleted
+"""
+
+PRUNE_WRITES_SQL = """
+WITH deleted AS (
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = ANY(%s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = w.thread_id
+            AND c.checkpoint_ns = w.checkpoint_ns
+            AND c.checkpoint_id = w.checkpoint_id
+      )
+    RETURNING pg_column_size(w.*) AS bytes
+)
+SELECT count(*) AS n, COALESCE(sum(bytes), 0) AS bytes FROM deleted
+"""
+
+# A blob is live while some checkpoint still lists its (channel, version)
+PRUNE_BLOBS_SQL = """
+WITH deleted AS (
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = ANY(%s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = b.thread_id
+            AND c.checkpoint_ns = b.checkpoint_ns
+            AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+      )
+    RETURNING pg_column_size(b.*) AS bytes
+)
+SELECT count(*) AS n, COALESCE(sum(bytes), 0) AS bytes FROM deleted
+"""
+
+
+def _delete_all_sql(table):
+    return f"""
+WITH deleted AS (
+    DELETE FROM {table} t WHERE t.thread_id = ANY(%s)
+    RETURNING pg_column_size(t.*) AS bytes
+)
+SELECT count(*) AS n, COALESCE(sum(bytes), 0) AS bytes FROM deleted
+"""
+
+
+@dataclass
+class RetentionReport:
+    threads_scanned: int = 0
+    threads_expired: int = 0
+    checkpoints_deleted: int = 0
+    writes_deleted: int = 0
+    blobs_deleted: int = 0
+    messages_deleted: int = 0
+    # Row sizes as stored (pg_column_size); disk space returns after VACUUM
+    bytes_reclaimed: int = 0
+
+    def add(self, field, row):
+        setattr(self, field, getattr(self, field) + row["n"])
+        self.bytes_reclaimed += row["bytes"]
+
+
+def run_retention(pool, keep=5, ttl_days=None, batch_size=200, pause=0.5, grace=300):
+    """One full pass over the catalog. Returns a RetentionReport."""
+    keep = max(keep, 1)
+    report = RetentionReport()
+    # Expired threads also lose their message log rows (MESSAGE_STORE=log) and UI projection
+    with pool.connection() as conn:
+        has_message_log = conn.execute("SELECT to_regclass('thread_messages') IS NOT NULL AS present").fetchone()["present"]
+        has_log_generations = conn.execute("SELECT to_regclass('thread_message_logs') IS NOT NULL AS present").fetchone()["present"]
+        has_projection = conn.execute("SELECT to_regclass('thread_ui_state') IS NOT NULL AS present").fetchone()["present"]
+    last_thread_id = ""
+    # No TTL: compare against a date that is never reached
+    ttl = ttl_days if ttl_days is not None else 1_000_000
+
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute(THREAD_BATCH_SQL, (ttl, last_thread_id, grace, batch_size)).fetchall()
+        if not rows:
+            return report
+
+        last_thread_id = rows[-1]["thread_id"]
+        report.threads_scanned += len(rows)
+        expired = [r["thread_id"] for r in rows if r["expired"]]
+        active = [r["thread_id"] for r in rows if not r["expired"]]
+
+        with pool.connection() as conn:
+            if expired:
+                report.threads_expired += len(expired)
+                report.add("checkpoints_deleted", conn.execute(_delete_all_sql("checkpoints"), (expired,)).fetchone())
+                report.add("writes_deleted", conn.execute(_delete_all_sql("checkpoint_writes"), (expired,)).fetchone())
+                report.add("blobs_deleted", conn.execute(_delete_all_sql("checkpoint_blobs"), (expired,)).fetchone())
+                if has_message_log:
+                    report.add("messages_deleted", conn.execute(_delete_all_sql("thread_messages"), (expired,)).fetchone())
+                if has_log_generations:
+                    report.bytes_reclaimed += conn.execute(_delete_all_sql("thread_message_logs"), (expired,)).fetchone()["bytes"]
+                if has_projection:
+                    for table in ("thread_ui_messages", "thread_ui_state"):
+                        report.bytes_reclaimed += conn.execute(_delete_all_sql(table), (expired,)).fetchone()["bytes"]
+                report.bytes_reclaimed += conn.execute(_delete_all_sql("thread_catalog"), (expired,)).fetchone()["bytes"]
+
+            if active:
+                report.add("checkpoints_deleted", conn.execute(PRUNE_CHECKPOINTS_SQL, (active, keep)).fetchone())
+                report.add("writes_deleted", conn.execute(PRUNE_WRITES_SQL, (active,)).fetchone())
+                report.add("blobs_deleted", conn.execute(PRUNE_BLOBS_SQL, (active,)).fetchone())
+
+        # Rate limit: leave room for the chat traffic between batches
+        time.sleep(pause)
+
+
+def start_retention_worker(pool, interval=3600, **kwargs):
+    """
+    Run retention every `interval` seconds on a daemon thread.
+    Returns a threading.Event; set it to stop the worker.
+    """
+    stop = threading.Event()
+
+    def loop():
+        while not stop.is_set():
+            try:
+                report = run_retention(pool, **kwargs)
+                print(f"Checkpoint retention: {asdict(report)}")
+            except Exception as e:
+                # Try again next round rather than killing the worker
+                print(f"Checkpoint retention failed: {e}")
+            stop.wait(interval)
+
+    threading.Thread(target=loop, name="checkpoint-retention", daemon=True).start()
+    return stop
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune old checkpoints and expire idle threads")
+    parser.add_argument("--keep", type=int, default=5, help="checkpoints kept per thread")
+    parser.add_argument("--ttl-days", type=float, default=None, help="delete threads idle this long")
+    parser.add_argument("--batch-size", type=int, default=200, help="threads per batch")
+    parser.add_argument("--pause", type=float, default=0.5, help="seconds to sleep between batches")
+    parser.add_argument("--grace", type=float, default=300, help="skip threads active in the last N seconds")
+    parser.add_argument("--every", type=float, default=None, help="keep running, once every N seconds")
+    args = parser.parse_args()
+
+    from init_db import get_pool
+
+    pool = get_pool()
+
+    options = dict(keep=args.keep, ttl_days=args.ttl_days, batch_size=args.batch_size,
+                   pause=args.pause, grace=args.grace)
+    if args.every:
+        start_retention_worker(pool, interval=args.every, **options).wait()
+    else:
+        print(asdict(run_retention(pool, **options)))
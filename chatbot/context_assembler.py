@@ -0,0 +1,225 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from search_cache import normalize_query
+from token_counting import count_message_tokens, trim_recent_messages
+
+# ======================================================
+# Context Assembly (summary + retrieved chunks + recent messages)
+# ======================================================
+# chat_node sends the model one prompt with a fixed token budget (MAX_TOKEN).
+# The summary and the retrieved chunks get capped shares of it, and the
+# recent messages get whatever is left. So the prompt stays the same size
+# however long the thread is and however much the retriever returns.
+# Retrieved chunks are deduplicated first. Neighbouring chunks of one file
+# share the chunker's overlap and are merged, and near-identical passages
+# from different files are kept once.
+
+CONTEXT_SUMMARY_SHARE = float(os.getenv("CONTEXT_SUMMARY_SHARE", "0.2"))
+CONTEXT_DOCS_SHARE = float(os.getenv("CONTEXT_DOCS_SHARE", "0.4"))
+# A passage that would be cut below this many tokens is left out instead
+MIN_PASSAGE_TOKENS = 40
+# Word 4-gram Jaccard similarity above which two passages count as the same
+NEAR_DUPLICATE_SIMILARITY = 0.8
+# Characters of a chunk looked up in its predecessor to find the shared overlap
+OVERLAP_PROBE_CHARS = 64
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+
+# Same estimate as count_tokens_approximately (about 4 characters per token)
+CHARS_PER_TOKEN = 4
+
+
+def count_text_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, tokens):
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    # Cut at a word boundary
+    cut = text.rfind(" ", 0, limit - 1)
+    return text[:cut if cut > 0 else limit - 1] + "…"
+
+
+# ---------- deduplication ----------
+
+def _strip_overlap(previous, text):
+    """`text` without the prefix it shares with the end of `previous`, or None."""
+    probe = text[:OVERLAP_PROBE_CHARS]
+    position = previous.rfind(probe) if probe else -1
+    if position == -1 or not text.startswith(previous[position:]):
+        return None
+    return text[len(previous) - position:]
+
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + 4]) for i in range(max(1, len(words) - 3))}
+
+
+def dedupe_chunks(hits):
+    """
+    Merge overlapping neighbours (same source, consecutive chunk_index) and
+    drop repeated or near-identical passages. Keeps the best score of what
+    was merged; returns passages best first.
+    """
+    seen_ids, by_source = set(), {}
+    for hit in hits:
+        key = hit.get("id")
+        if key is not None and key in seen_ids:
+            continue
+        seen_ids.add(key)
+        by_source.setdefault(hit.get("source"), []).append(dict(hit))
+
+    passages = []
+    for source, chunks in by_source.items():
+        chunks.sort(key=lambda c: c.get("chunk_index", 0))
+        current = None
+        for chunk in chunks:
+            rest = None
+            if current is not None and chunk.get("chunk_index", 0) == current["last_index"] + 1:
+                rest = _strip_overlap(current["text"], chunk["text"])
+            if rest is not None:
+                current["text"] += rest
+                current["score"] = max(current["score"], chunk.get("score", 0))
+                current["last_index"] += 1
+            else:
+                current = {**chunk, "score": chunk.get("score", 0), "last_index": chunk.get("chunk_index", 0)}
+                passages.append(current)
+
+    passages.sort(key=lambda p: p["score"], reverse=True)
+    kept, kept_shingles = [], []
+    for passage in passages:
+        shingles = _shingles(passage["text"])
+        if any(len(shingles & other) / len(shingles | other) >= NEAR_DUPLICATE_SIMILARITY for other in kept_shingles):
+            continue
+        passage.pop("last_index")
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept
+
+
+# ---------- assembly ----------
+
+def _pack_passages(passages, budget):
+    lines, used = [], 0
+    for passage in passages:
+        header = f"[{passage.get('source') or 'document'}] "
+        cost = count_text_tokens(header + passage["text"]) + 1
+        if used + cost > budget:
+            room = budget - used - count_text_tokens(header) - 1
+            if room >= MIN_PASSAGE_TOKENS:
+                lines.append(header + truncate_to_tokens(passage["text"], room))
+            break
+        lines.append(header + passage["text"])
+        used += cost
+    return lines
+
+
+def assemble_context(summary, messages, hits, max_tokens):
+    """
+    Prompt messages for chat_node within `max_tokens`: one system message
+    with the summary and the retrieved passages (each capped by its share
+    of the budget), then as many recent messages as fit in the rest.
+    """
+    parts, used = [], 0
+    if summary:
+        # The summarizer is asked to stay within this; cutting is only a safety net
+        parts.append(f"Summary of previous conversation: {truncate_to_tokens(summary, summary_budget(max_tokens))}")
+        used += count_text_tokens(parts[-1])
+    if hits:
+        # The turn being answered (question + this turn's tool results) must
+        # still fit after the excerpts, so they only get what it leaves over
+        turn_start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=len(messages))
+        turn_tokens = sum(count_message_tokens(m) for m in messages[turn_start:])
+        docs_budget = min(int(max_tokens * CONTEXT_DOCS_SHARE), max_tokens - used - turn_tokens)
+        lines = _pack_passages(dedupe_chunks(hits), docs_budget)
+        if lines:
+            parts.append("Relevant excerpts from our documents (cite the source in brackets):\n"
+                         + "\n\n".join(lines))
+
+    if not parts:
+        return trim_recent_messages(messages, max_tokens=max_tokens)
+    # trim_recent_messages charges the system message to the budget first
+    return trim_recent_messages([SystemMessage(content="\n\n".join(parts))] + list(messages),
+                                max_tokens=max_tokens)
+
+
+def summary_budget(max_tokens):
+    """Tokens the conversation summary may take in the prompt."""
+    return int(max_tokens * CONTEXT_SUMMARY_SHARE)
+
+
+def message_budget(max_tokens):
+    """Tokens the recent messages get even when the summary and excerpts use their full shares."""
+    return max_tokens - summary_budget(max_tokens) - int(max_tokens * CONTEXT_DOCS_SHARE)
+
+
+def window_start(messages, max_tokens):
+    """Index of the oldest message trim_recent_messages keeps within max_tokens."""
+    return len(messages) - len(trim_recent_messages(messages, max_tokens=max_tokens))
+
+
+def latest_question(messages):
+    """Text of the newest user message (the turn being answered), or None."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return None
+
+
+# ---------- retrieval cache ----------
+
+class RetrievalCache:
+    """
+    Retrieved chunks per (thread, normalized question), TTL + LRU. chat_node
+    runs again after every tool round of a turn with the same question, and
+    users re-ask; neither should pay for another embedding call and search.
+    """
+
+    def __init__(self, ttl=RETRIEVAL_CACHE_TTL, max_size=RETRIEVAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # (thread_id, query) -> (expires_at, hits)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(thread_id, query):
+        return thread_id, normalize_query(query)
+
+    def get(self, thread_id, query):
+        key = self.key(thread_id, query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, thread_id, query, hits):
+        key = self.key(thread_id, query)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
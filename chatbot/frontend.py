@@ -1,19 +1,17 @@
 import streamlit as st
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
-
-# Import from our logic file
-from chatbot import (
-    chatbot, 
-    get_config, 
-    generate_thread_id, 
-    load_messages_from_langgraph, 
-    get_all_thread_ids, 
-    get_thread_title, 
-    format_msg
+
+# Thin client: the graph runs in api_server.py (see api_client.py / CHAT_API_URL)
+from api_client import (
+    generate_thread_id,
+    load_messages,
+    get_thread_page,
+    stream_turn
 )
+from stream_renderer import ThrottledRenderer
 
 st.set_page_config(page_title="GenAI Chat UI", layout="wide")
 
+SIDEBAR_PAGE_SIZE = 20
 
 
 # ======================================================
@@ -23,7 +21,7 @@ st.set_page_config(page_title="GenAI Chat UI", layout="wide")
 if "thread_id" not in st.session_state:
     st.session_state.thread_id = generate_thread_id()
     # Initial Load
-    st.session_state.messages = load_messages_from_langgraph(st.session_state.thread_id)
+    st.session_state.messages = load_messages(st.session_state.thread_id)
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -31,6 +29,24 @@ if "messages" not in st.session_state:
 if "is_streaming" not in st.session_state:
     st.session_state.is_streaming = False
 
+def reset_sidebar(search=""):
+    # Drop loaded pages; the first page is fetched again on the next render
+    st.session_state.sidebar_search = search
+    st.session_state.sidebar_threads = None
+    st.session_state.sidebar_cursor = None
+
+def load_sidebar_page():
+    page, cursor = get_thread_page(
+        cursor=st.session_state.sidebar_cursor,
+        search=st.session_state.sidebar_search or None,
+        limit=SIDEBAR_PAGE_SIZE,
+    )
+    st.session_state.sidebar_threads = (st.session_state.sidebar_threads or []) + page
+    st.session_state.sidebar_cursor = cursor
+
+if "sidebar_threads" not in st.session_state:
+    reset_sidebar()
+
 # ======================================================
 # 2. Sidebar (History Management)
 # ======================================================
@@ -44,22 +60,32 @@ if st.sidebar.button("➕ New Chat", use_container_width=True):
 
 st.sidebar.markdown("---")
 
-db_threads = get_all_thread_ids()
+search = st.sidebar.text_input("Search chats", value=st.session_state.sidebar_search)
+if search != st.session_state.sidebar_search:
+    reset_sidebar(search)
 
-if db_threads:
-    # Show newest first
-    for tid in db_threads[::-1]:
-        title = get_thread_title(tid)
-        is_active = (tid == st.session_state.thread_id)
-        
-        label = f"🔵 {title}" if is_active else f"{title}"
-        
-        if st.sidebar.button(label, key=tid, use_container_width=True):
-            if st.session_state.thread_id != tid:
-                st.session_state.thread_id = tid
-                # OPTIMIZATION: Only fetch from DB when switching threads
-                st.session_state.messages = load_messages_from_langgraph(tid)
-                st.rerun()
+# Only the pages the user has asked for are queried and rendered,
+# so a rerun costs one page at most, however many threads exist.
+if st.session_state.sidebar_threads is None:
+    load_sidebar_page()
+
+for thread in st.session_state.sidebar_threads:
+    tid = thread["thread_id"]
+    is_active = (tid == st.session_state.thread_id)
+    
+    label = f"🔵 {thread['title']}" if is_active else f"{thread['title']}"
+    
+    if st.sidebar.button(label, key=tid, use_container_width=True):
+        if st.session_state.thread_id != tid:
+            st.session_state.thread_id = tid
+            # OPTIMIZATION: Only fetch from DB when switching threads
+            st.session_state.messages = load_messages(tid)
+            st.rerun()
+
+if st.session_state.sidebar_cursor is not None:
+    if st.sidebar.button("Load more", use_container_width=True):
+        load_sidebar_page()
+        st.rerun()
 
 # ======================================================
 # 3. Main Chat Interface
@@ -91,50 +117,50 @@ if user_input:
     # 2. Stream Assistant Response
     with st.chat_message("assistant"):
         placeholder = st.empty()
-        full_response = ""
+        # Chunks are coalesced; the placeholder re-renders a few times per second at most
+        renderer = ThrottledRenderer(placeholder.markdown)
         
         # Initialize the status container
         with st.status("Thinking...", expanded=True) as status:
-            result = chatbot.stream(
-                {"messages": [HumanMessage(content=user_input)]},
-                config=get_config(st.session_state.thread_id),
-                stream_mode="messages"
-            )
-            # print(f"Result",result)
+            # Summary refresh runs in the background (server-side) once this stream ends
+            events = stream_turn(st.session_state.thread_id, user_input)
             
-            for chunk, metadata in result:
+            for event, data in events:
                 # A. Handle Tool Calls (When the LLM decides to use a tool)
-                if isinstance(chunk, AIMessage) and chunk.tool_calls:
-                    for tool_call in chunk.tool_calls:
-                        tool_name = tool_call["name"]
-                        status.write(f"Calling tool: **{tool_name}**...")
-                        status.update(label=f"Running {tool_name}...", state="running")
+                if event == "tool_call":
+                    # Show the text so far before the stream pauses for the tool
+                    renderer.flush()
+                    status.write(f"Calling tool: **{data['name']}**...")
+                    status.update(label=f"Running {data['name']}...", state="running")
                 
                 # B. Handle Tool Results (When the tool finishes)
-                if isinstance(chunk, ToolMessage):
-                    status.write(f"✅ Tool **{chunk.name}** completed.")
+                elif event == "tool_result":
+                    status.write(f"✅ Tool **{data['name']}** completed.")
                     # Keep status visible but update the label
                     status.update(label="Processing results...", state="running")
-                    continue
                 
                 # C. Process AI Text Response
-                if isinstance(chunk, AIMessage):
-                    # Skip if it's just a tool call notification without content
-                    if chunk.tool_calls and not chunk.content:
-                        continue
-                        
+                elif event == "token":
                     # Once we get actual text, we can mark the status as complete
-                    status.update(label="Assistant response generated", state="complete", expanded=False)
+                    # (once, not on every chunk)
+                    if renderer.chunks == 0:
+                        status.update(label="Assistant response generated", state="complete", expanded=False)
                     
-                    chunk_text = format_msg(chunk.content)
-                    full_response += chunk_text
-                    
-                    if full_response:
-                        placeholder.markdown(full_response)
+                    renderer.push(data["text"])
+
+                elif event == "error":
+                    status.update(label="Something went wrong", state="error")
+                    st.error(data["message"])
+
+            # Final flush: whatever arrived since the last render
+            renderer.flush()
         
         # 3. Save Final Response to Local State
+        full_response = renderer.text
         if full_response:
             st.session_state.messages.append({"role": "assistant", "content": full_response})
 
     st.session_state.is_streaming = False
+    # This thread just moved to the top; refetch the first page
+    reset_sidebar(st.session_state.sidebar_search)
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,316 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# ======================================================
+# Graph Metrics (per node / LLM / tool / checkpoint)
+# ======================================================
+# A LangChain callback handler, passed in the run config, that sees every
+# LangGraph node, chat-model call and tool call of a run:
+#
+#   workflow.invoke(state, config=instrument("blog_chain"))
+#
+# plus a wrapper for checkpointer reads/writes (instrument_checkpointer).
+# Every observation goes into in-process histograms (render_prometheus() ->
+# Prometheus text format) and, if GRAPH_METRICS_JSONL is set, one JSON object
+# per line into that file.
+#
+#   langgraph_node_seconds{graph,node}              wall time per node run
+#   langgraph_llm_seconds{graph,node,model}         chat model calls
+#   langgraph_llm_tokens_total{graph,node,model,direction="in"|"out"}
+#   langgraph_tool_seconds{graph,node,tool}
+#   langgraph_checkpoint_seconds{graph,op="read"|"write"}
+#   langgraph_errors_total{graph,kind,name}
+#
+# Scripts outside chatbot/ (the *_workflow folders) use this module when
+# chatbot/ is on the path (PYTHONPATH=chatbot python sequential_workflow/01prompt_chaining.py)
+# and run uninstrumented otherwise.
+
+# Optional log file, e.g. graph_metrics.jsonl; written under the metrics lock on every observation, so off by default
+GRAPH_METRICS_JSONL = os.getenv("GRAPH_METRICS_JSONL", "")
+GRAPH_METRICS_PROM = os.getenv("GRAPH_METRICS_PROM")  # optional textfile for short-lived scripts
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    "langgraph_node_seconds": "Wall time of one graph node run",
+    "langgraph_llm_seconds": "Wall time of one chat model call",
+    "langgraph_llm_tokens_total": "Tokens sent to / generated by chat models",
+    "langgraph_tool_seconds": "Wall time of one tool call",
+    "langgraph_checkpoint_seconds": "Checkpointer read / write time",
+    "langgraph_errors_total": "Failed node, LLM, tool and checkpoint calls",
+}
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.total += seconds
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{escape(v)}"' for k, v in labels)
+
+
+class GraphMetrics:
+    def __init__(self, jsonl_path=GRAPH_METRICS_JSONL):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        # metric name -> label tuple -> _Histogram / float
+        self._histograms = defaultdict(dict)
+        self._counters = defaultdict(lambda: defaultdict(float))
+        self._log = None
+
+    # ---------- recording ----------
+
+    def observe(self, metric, seconds, labels, **fields):
+        """Record one timing; `fields` only go to the JSONL log."""
+        key = tuple(labels.items())
+        with self._lock:
+            histogram = self._histograms[metric].get(key)
+            if histogram is None:
+                histogram = self._histograms[metric][key] = _Histogram()
+            histogram.observe(seconds)
+            self._write({"ts": time.time(), "metric": metric, **labels, "seconds": round(seconds, 6), **fields})
+
+    def count(self, metric, value, labels):
+        with self._lock:
+            self._counters[metric][tuple(labels.items())] += value
+
+    def _write(self, record):
+        if not self.jsonl_path:
+            return
+        if self._log is None:
+            self._log = open(self.jsonl_path, "a", buffering=1, encoding="utf-8")
+        self._log.write(json.dumps(record, default=str) + "\n")
+
+    @contextmanager
+    def timer(self, metric, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            kind = metric.removeprefix("langgraph_").removesuffix("_seconds")
+            self.count("langgraph_errors_total", 1, {"graph": labels.get("graph", ""), "kind": kind,
+                                                     "name": labels.get("node") or labels.get("op", "")})
+            raise
+        finally:
+            self.observe(metric, time.perf_counter() - start, labels)
+
+    # ---------- export ----------
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for metric, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} histogram")
+                for key, h in series.items():
+                    # Buckets are stored per bound already cumulative (seconds <= bound)
+                    for bound, n in zip(BUCKETS, h.counts):
+                        lines.append(f'{metric}_bucket{{{_labels(key + (("le", bound),))}}} {n}')
+                    lines.append(f'{metric}_bucket{{{_labels(key + (("le", "+Inf"),))}}} {h.count}')
+                    lines.append(f"{metric}_sum{{{_labels(key)}}} {h.total:.6f}")
+                    lines.append(f"{metric}_count{{{_labels(key)}}} {h.count}")
+            for metric, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{{{_labels(key)}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Write the text format to a file (node_exporter textfile collector style)."""
+        path = path or GRAPH_METRICS_PROM
+        if not path:
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+    # ---------- instrumentation ----------
+
+    def handler(self, graph):
+        return MetricsCallbackHandler(self, graph)
+
+    def instrument_checkpointer(self, saver, graph):
+        """Time reads (get_tuple) and writes (put / put_writes) of a sync or async saver, in place."""
+        ops = {"get_tuple": "read", "put": "write", "put_writes": "write"}
+        for name, op in ops.items():
+            method = getattr(saver, name)
+
+            def timed(*args, _method=method, _op=op, **kwargs):
+                with self.timer("langgraph_checkpoint_seconds", graph=graph, op=_op):
+                    return _method(*args, **kwargs)
+
+            setattr(saver, name, timed)
+
+            amethod = getattr(saver, "a" + name)
+
+            async def atimed(*args, _method=amethod, _op=op, **kwargs):
+                with self.timer("langgraph_checkpoint_seconds", graph=graph, op=_op):
+                    return await _method(*args, **kwargs)
+
+            setattr(saver, "a" + name, atimed)
+        return saver
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Per-run timings from LangChain callbacks. One handler per graph name; thread-safe."""
+
+    # Called in the thread / event loop of the run itself, so timings aren't skewed
+    run_inline = True
+
+    def __init__(self, metrics, graph):
+        self.metrics = metrics
+        self.graph = graph
+        self._lock = threading.Lock()
+        # run_id -> (kind, labels, start, extra)
+        self._runs = {}
+
+    def _start(self, run_id, kind, labels, **extra):
+        with self._lock:
+            self._runs[run_id] = (kind, labels, time.perf_counter(), extra)
+
+    def _end(self, run_id):
+        with self._lock:
+            entry = self._runs.pop(run_id, None)
+        if entry is None:
+            return None
+        kind, labels, start, extra = entry
+        return kind, labels, time.perf_counter() - start, extra
+
+    @staticmethod
+    def _node(metadata):
+        return (metadata or {}).get("langgraph_node", "")
+
+    # ---------- nodes ----------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = self._node(metadata)
+        # The node's own run is named after the node; runs nested inside it
+        # (e.g. a node function with the same name) are not counted twice.
+        if node and kwargs.get("name") == node:
+            with self._lock:
+                parent = self._runs.get(parent_run_id)
+            if parent is None or parent[0] != "node" or parent[1]["node"] != node:
+                self._start(run_id, "node", {"graph": self.graph, "node": node})
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended:
+            self.metrics.observe("langgraph_node_seconds", ended[2], ended[1])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended:
+            self.metrics.observe("langgraph_node_seconds", ended[2], ended[1], error=type(error).__name__)
+            self.metrics.count("langgraph_errors_total", 1, {"graph": self.graph, "kind": "node", "name": ended[1]["node"]})
+
+    # ---------- chat models ----------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name", "")
+        self._start(run_id, "llm", {"graph": self.graph, "node": self._node(metadata), "model": model})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name", "")
+        self._start(run_id, "llm", {"graph": self.graph, "node": self._node(metadata), "model": model})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if not ended:
+            return
+        labels, seconds = ended[1], ended[2]
+        tokens_in = tokens_out = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                tokens_in += usage.get("input_tokens", 0)
+                tokens_out += usage.get("output_tokens", 0)
+        if not (tokens_in or tokens_out):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            tokens_in, tokens_out = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        self.metrics.observe("langgraph_llm_seconds", seconds, labels, tokens_in=tokens_in, tokens_out=tokens_out)
+        self.metrics.count("langgraph_llm_tokens_total", tokens_in, {**labels, "direction": "in"})
+        self.metrics.count("langgraph_llm_tokens_total", tokens_out, {**labels, "direction": "out"})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended:
+            self.metrics.observe("langgraph_llm_seconds", ended[2], ended[1], error=type(error).__name__)
+            self.metrics.count("langgraph_errors_total", 1, {"graph": self.graph, "kind": "llm", "name": ended[1]["model"]})
+
+    # ---------- tools ----------
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):
+        tool = kwargs.get("name") or (serialized or {}).get("name", "")
+        self._start(run_id, "tool", {"graph": self.graph, "node": self._node(metadata), "tool": tool})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended:
+            self.metrics.observe("langgraph_tool_seconds", ended[2], ended[1])
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended:
+            self.metrics.observe("langgraph_tool_seconds", ended[2], ended[1], error=type(error).__name__)
+            self.metrics.count("langgraph_errors_total", 1, {"graph": self.graph, "kind": "tool", "name": ended[1]["tool"]})
+
+
+def serve_prometheus(port, host="0.0.0.0"):
+    """Expose GET /metrics on a daemon thread (for processes without a web server)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="graph-metrics", daemon=True).start()
+    return server
+
+
+# Process-wide registry used by all graphs
+metrics = GraphMetrics()
+_handlers = {}
+
+
+def instrument(graph, config=None):
+    """`config` (or a new one) with the metrics handler for `graph` added to its callbacks."""
+    handler = _handlers.get(graph)
+    if handler is None:
+        handler = _handlers.setdefault(graph, metrics.handler(graph))
+    config = dict(config or {})
+    config["callbacks"] = [*(config.get("callbacks") or []), handler]
+    return config
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import time
+
+from bm25_index import BM25Index, rrf_fuse
+
+# ======================================================
+# Hybrid Retrieval (vector + BM25, reciprocal rank fusion)
+# ======================================================
+# Wraps a dense backend (VectorIndex or PgVectorStore) with an in-process
+# BM25 index over the same documents and fuses both rankings with RRF, so a
+# question about "NVDA" or "clause 14.2" finds the chunk that says exactly
+# that even when its embedding is not the nearest.
+#
+# The BM25 index follows the backend instead of being written by the
+# ingester: both backends hand out increasing ids, so sync() adds whatever
+# came after the last id it has seen. The first search builds it; later
+# ones catch up at most every BM25_SYNC_SECONDS.
+#
+# Deletions (changed chunks, ingest --prune) show up as a backend count
+# below ours; the missing keys are then flagged in the BM25 index. Flagged
+# documents still hold memory and skew term frequencies, so the index is
+# rebuilt from the backend once they pass BM25_REBUILD_DELETED_SHARE, and
+# whenever the local vector index itself was rebuilt (rows renumbered).
+
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Each ranking contributes this many candidates per requested result
+HYBRID_DEPTH = int(os.getenv("RAG_HYBRID_DEPTH", "5"))
+HYBRID_MIN_CANDIDATES = 20
+BM25_SYNC_SECONDS = float(os.getenv("RAG_BM25_SYNC_SECONDS", "30"))
+BM25_SYNC_BATCH = 2000
+BM25_REBUILD_DELETED_SHARE = float(os.getenv("RAG_BM25_REBUILD_DELETED_SHARE", "0.2"))
+
+
+class HybridRetriever:
+    def __init__(self, dense, keyword=None, rrf_k=RRF_K, sync_seconds=BM25_SYNC_SECONDS):
+        self.dense = dense
+        self.keyword = keyword or BM25Index()
+        self.rrf_k = rrf_k
+        self.sync_seconds = sync_seconds
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        self._created = getattr(dense, "created", None)
+
+    def sync(self, force=False):
+        """Bring the keyword index up to date with the backend's additions and deletions."""
+        if not force and self._synced_at is not None and time.monotonic() - self._synced_at < self.sync_seconds:
+            return
+        # One catch-up at a time; concurrent searches use the index as it is
+        if not self._sync_lock.acquire(blocking=self._synced_at is None):
+            return
+        try:
+            live = self.dense.count()  # also makes VectorIndex pick up the ingester's writes
+            created = getattr(self.dense, "created", None)
+            if created != self._created:
+                self._created = created
+                self._rebuild()
+            self._add_new(self.keyword)
+            if self.keyword.live_count > live:
+                self.keyword.delete(self.dense.missing_ids(self.keyword.live_keys()))
+                if self.keyword.deleted_fraction > BM25_REBUILD_DELETED_SHARE:
+                    self._rebuild()
+            self._synced_at = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def _add_new(self, keyword):
+        batch = []
+        for doc in self.dense.iter_docs(keyword.max_key):
+            batch.append((doc["id"], doc["text"]))
+            if len(batch) == BM25_SYNC_BATCH:
+                keyword.add_many(batch)
+                batch = []
+        keyword.add_many(batch)
+
+    def _rebuild(self):
+        # Built aside and swapped in, so searches keep using the old index meanwhile
+        keyword = BM25Index(self.keyword.k1, self.keyword.b)
+        self._add_new(keyword)
+        self.keyword = keyword
+
+    def _depth(self, k):
+        return max(k * HYBRID_DEPTH, HYBRID_MIN_CANDIDATES)
+
+    def _keyword_hits(self, query, k, filters):
+        self.sync()
+        # Filters are applied when the documents are fetched, so look deeper
+        return self.keyword.search(query, self._depth(k) * (4 if filters else 1))
+
+    def _fuse(self, dense_hits, keyword_hits, fetched, k):
+        docs = {hit["id"]: hit for hit in dense_hits}
+        docs.update(fetched)
+        # Keyword hits without a document were deleted or filtered out
+        keyword_ranking = [key for key, _ in keyword_hits if key in docs]
+        fused = rrf_fuse([[hit["id"] for hit in dense_hits], keyword_ranking], k, self.rrf_k)
+        return [{**docs[key], "score": round(score, 4)} for key, score in fused]
+
+    def search(self, query, embedding, k=4, filters=None):
+        """Fused top-k documents for one question and its embedding."""
+        dense_hits = self.dense.search_docs([embedding], self._depth(k), filters=filters)[0]
+        keyword_hits = self._keyword_hits(query, k, filters)
+        seen = {hit["id"] for hit in dense_hits}
+        fetched = self.dense.get_docs([key for key, _ in keyword_hits if key not in seen], filters)
+        return self._fuse(dense_hits, keyword_hits, fetched, k)
+
+    async def asearch(self, query, embedding, k=4, filters=None):
+        if hasattr(self.dense, "atop_k"):
+            dense_hits = await self.dense.atop_k(embedding, self._depth(k), filters)
+        else:
+            dense_hits = (await asyncio.to_thread(self.dense.search_docs, [embedding], self._depth(k),
+                                                  filters=filters))[0]
+        # Scoring (and a pending sync) is CPU work; keep it off the event loop
+        keyword_hits = await asyncio.to_thread(self._keyword_hits, query, k, filters)
+        seen = {hit["id"] for hit in dense_hits}
+        missing = [key for key, _ in keyword_hits if key not in seen]
+        if hasattr(self.dense, "aget_docs"):
+            fetched = await self.dense.aget_docs(missing, filters)
+        else:
+            fetched = await asyncio.to_thread(self.dense.get_docs, missing, filters)
+        return self._fuse(dense_hits, keyword_hits, fetched, k)
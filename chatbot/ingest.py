@@ -0,0 +1,215 @@
+"""
+Ingest a directory of documents into the chatbot's knowledge base.
+
+    python ingest.py docs/
+    python ingest.py docs/ --ext .md .txt --chunk-size 1200 --overlap 200 --workers 4 --prune
+
+Files are read one at a time and cut into overlapping chunks. Every chunk
+is identified by an xxhash of its text. Chunks whose (source, hash) is
+already stored are kept as they are; only new ones are embedded. Those go
+out in batches through a bounded pool of workers and are written as each
+batch comes back. Chunks that disappeared from a file (and, with --prune,
+files that disappeared) are deleted after the new ones are in, so
+retrieval never sees a gap. Re-ingesting an unchanged corpus only reads,
+chunks and hashes it.
+
+Writes to the backend the chat graph reads (RAG_BACKEND, see chatbot.py).
+"""
+import argparse
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import xxhash
+
+DEFAULT_EXTENSIONS = (".md", ".txt", ".rst")
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1200"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+EMBED_RETRIES = 3
+
+# Preferred cut points, best first, searched in the second half of a window
+BREAKS = ("\n\n", "\n", ". ", " ")
+
+
+# ======================================================
+# Files & Chunks
+# ======================================================
+
+def iter_files(root, extensions):
+    """(source, path) for matching files under root, in a stable order."""
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                path = os.path.join(directory, name)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def chunk_text(text, size, overlap):
+    """
+    Windows of at most `size` characters, each starting about `overlap`
+    characters before the previous one ended. Cuts prefer paragraph, line,
+    sentence and word boundaries, so an edit mostly changes the chunks
+    around it and the rest keep their hashes.
+    """
+    start, n = 0, len(text)
+    while start < n:
+        end = min(n, start + size)
+        if end < n:
+            for sep in BREAKS:
+                cut = text.rfind(sep, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+        if end >= n:
+            return
+        # Step back by the overlap, then forward to the next word
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+
+def content_hash(text):
+    return xxhash.xxh3_64_hexdigest(text.encode("utf-8"))
+
+
+# ======================================================
+# Backends
+# ======================================================
+
+def open_backend():
+    """The store the chat graph reads from; a local index is created on first ingest."""
+    from chatbot import RAG_BACKEND, RAG_INDEX_PATH, RAG_EMBEDDING_DIM
+    if RAG_BACKEND == "pgvector":
+        from init_db import get_pool
+        from pg_vector_store import PgVectorStore
+        store = PgVectorStore(get_pool(), RAG_EMBEDDING_DIM)
+        store.ensure_schema()
+        return store
+    from vector_index import VectorIndex
+    if VectorIndex.exists(RAG_INDEX_PATH):
+        return VectorIndex(RAG_INDEX_PATH)
+    return VectorIndex.create(RAG_INDEX_PATH, RAG_EMBEDDING_DIM)
+
+
+def write_chunks(backend, chunks, vectors):
+    from vector_index import VectorIndex
+    if isinstance(backend, VectorIndex):
+        backend.add(vectors, chunks)
+    else:
+        backend.add(chunks, vectors)
+
+
+# ======================================================
+# Pipeline
+# ======================================================
+
+def embed_batch(embeddings, chunks):
+    for attempt in range(EMBED_RETRIES):
+        try:
+            return chunks, embeddings.embed_documents([chunk["text"] for chunk in chunks])
+        except Exception:
+            if attempt == EMBED_RETRIES - 1:
+                raise
+            # Usually a rate limit; back off and retry the same batch
+            time.sleep(2 ** attempt)
+
+
+def ingest(root, backend, embeddings, extensions=DEFAULT_EXTENSIONS, chunk_size=INGEST_CHUNK_SIZE,
+           overlap=INGEST_CHUNK_OVERLAP, batch_size=INGEST_BATCH_SIZE, workers=INGEST_WORKERS,
+           prune=False, dry_run=False):
+    """Bring the backend in line with the files under root. Returns counters."""
+    stats = Counter()
+    stored = backend.chunk_hashes()
+    stale, batch = [], []
+    in_flight = deque()
+
+    def drain(limit):
+        # Bounded: at most `limit` batches are embedding at any time
+        while len(in_flight) > limit:
+            chunks, vectors = in_flight.popleft().result()
+            write_chunks(backend, chunks, vectors)
+            stats["embedded"] += len(chunks)
+
+    def submit():
+        if batch and not dry_run:
+            in_flight.append(executor.submit(embed_batch, embeddings, list(batch)))
+            drain(workers)
+        batch.clear()
+
+    t0 = time.perf_counter()
+    seen_sources = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for source, path in iter_files(root, tuple(extensions)):
+            seen_sources.add(source)
+            stats["files"] += 1
+            with open(path, encoding="utf-8", errors="replace") as f:
+                text = f.read()
+            stats["bytes"] += len(text)
+            known = stored.get(source, {})
+            kept = set()
+            for index, chunk in enumerate(chunk_text(text, chunk_size, overlap)):
+                stats["chunks"] += 1
+                digest = content_hash(chunk)
+                if digest in kept:
+                    stats["duplicate"] += 1
+                    continue
+                kept.add(digest)
+                if digest in known:
+                    stats["unchanged"] += 1
+                    continue
+                stats["new"] += 1
+                batch.append({"source": source, "chunk_index": index, "text": chunk, "hash": digest})
+                if len(batch) == batch_size:
+                    submit()
+            stale.extend(i for digest, ids in known.items() if digest not in kept for i in ids)
+            # A repeated chunk is stored once; extra stored copies are stale too
+            stale.extend(i for digest, ids in known.items() if digest in kept for i in ids[1:])
+        submit()
+        drain(0)
+
+    if prune:
+        for source, known in stored.items():
+            if source not in seen_sources:
+                stale.extend(i for ids in known.values() for i in ids)
+    stats["deleted"] = len(stale)
+    if stale and not dry_run:
+        backend.delete(stale)
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest documents into the RAG store")
+    parser.add_argument("root")
+    parser.add_argument("--ext", nargs="+", default=list(DEFAULT_EXTENSIONS))
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=INGEST_CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--prune", action="store_true", help="delete chunks of files no longer under root")
+    parser.add_argument("--dry-run", action="store_true", help="count what would change, embed nothing")
+    args = parser.parse_args()
+    if args.overlap >= args.chunk_size:
+        parser.error("--overlap must be smaller than --chunk-size")
+
+    from chatbot import get_embeddings
+    embeddings = get_embeddings()
+    stats = ingest(args.root, open_backend(), embeddings, [e.lower() for e in args.ext], args.chunk_size,
+                   args.overlap, args.batch_size, args.workers, args.prune, args.dry_run)
+
+    seconds = stats["seconds"]
+    print(f"{stats['files']} files, {stats['bytes'] / 2**20:.1f} MB, {stats['chunks']} chunks in {seconds:.1f}s")
+    print(f"  unchanged {stats['unchanged']}, new {stats['new']}, duplicate {stats['duplicate']}, "
+          f"deleted {stats['deleted']}{' (dry run)' if args.dry_run else ''}")
+    print(f"  {stats['chunks'] / seconds:.0f} chunks/sec processed, {stats['embedded'] / seconds:.0f} chunks/sec embedded")
+
+
+if __name__ == "__main__":
+    main()
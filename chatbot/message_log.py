@@ -0,0 +1,334 @@
+import threading
+from collections import OrderedDict
+
+from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+# ======================================================
+# Append-only Message Log
+# ======================================================
+# With the stock savers every checkpoint re-serializes the whole `messages`
+# list, so storage grows quadratically with thread length. These savers keep
+# each message once, in a per-thread log table keyed by position, and store
+# only a reference to it in the checkpoint itself: the log's generation and
+# the thread's high-water mark, as "generation:hwm".
+#
+#   put:        write only messages the log doesn't have yet, then the checkpoint
+#   get_tuple:  replace the reference with messages[:hwm], reading only the
+#               tail that isn't already cached in-process
+#
+# Checkpoints written by the stock saver (a full list) are read as-is, and
+# the list moves into the log on the next write.
+# History rewrites (forks, RemoveMessage) overwrite positions in place and
+# cut the log to the new length, in one transaction, and bump the thread's
+# generation (thread_message_logs). A cached log is used only for
+# checkpoints of its own generation, so every saver and process re-reads a
+# rewritten log instead of serving its old copy. Older checkpoints of a
+# rewritten thread see the rewritten log, cut to their own length.
+
+MESSAGES_CHANNEL = "messages"
+MESSAGE_LOG_CACHE_THREADS = 256
+
+CREATE_MESSAGE_LOG_SQL = """
+CREATE TABLE IF NOT EXISTS thread_messages (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    seq INTEGER NOT NULL,
+    message_id TEXT,
+    type TEXT NOT NULL,
+    blob BYTEA NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, seq)
+);
+"""
+
+# Per thread: bumped on every history rewrite (no row = generation 0)
+CREATE_LOG_GENERATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS thread_message_logs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns)
+);
+"""
+
+UPSERT_MESSAGE_SQL = """
+INSERT INTO thread_messages (thread_id, checkpoint_ns, seq, message_id, type, blob)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT (thread_id, checkpoint_ns, seq) DO UPDATE SET
+    message_id = EXCLUDED.message_id,
+    type = EXCLUDED.type,
+    blob = EXCLUDED.blob
+"""
+
+TRUNCATE_LOG_SQL = """
+DELETE FROM thread_messages
+WHERE thread_id = %s AND checkpoint_ns = %s AND seq >= %s
+"""
+
+UPSERT_GENERATION_SQL = """
+INSERT INTO thread_message_logs (thread_id, checkpoint_ns, generation)
+VALUES (%s, %s, %s)
+ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET generation = EXCLUDED.generation
+"""
+
+SELECT_GENERATION_SQL = """
+SELECT generation FROM thread_message_logs
+WHERE thread_id = %s AND checkpoint_ns = %s
+"""
+
+SELECT_MESSAGE_IDS_SQL = """
+SELECT seq, message_id FROM thread_messages
+WHERE thread_id = %s AND checkpoint_ns = %s
+ORDER BY seq
+"""
+
+SELECT_MESSAGES_SQL = """
+SELECT seq, type, blob FROM thread_messages
+WHERE thread_id = %s AND checkpoint_ns = %s AND seq >= %s AND seq < %s
+ORDER BY seq
+"""
+
+DELETE_MESSAGES_SQL = "DELETE FROM thread_messages WHERE thread_id = %s"
+DELETE_GENERATIONS_SQL = "DELETE FROM thread_message_logs WHERE thread_id = %s"
+
+
+def log_ref(generation, hwm):
+    """Checkpoint value standing in for the messages (a str, so it stays inline)."""
+    return f"{generation}:{hwm}"
+
+
+def parse_log_ref(value):
+    """(generation, hwm) for a log reference, None for anything else (a full message list)."""
+    if isinstance(value, str) and ":" in value:
+        generation, hwm = value.split(":", 1)
+        return int(generation), int(hwm)
+    # Written before generations existed
+    if isinstance(value, int) and not isinstance(value, bool):
+        return 0, value
+    return None
+
+
+class _MessageLogMixin:
+    """Shared bookkeeping for the sync and async savers (no I/O in here)."""
+
+    def _init_log_cache(self):
+        # (thread_id, checkpoint_ns) -> (generation, messages known to be in the log, in order)
+        self._log_cache = OrderedDict()
+        self._log_cache_lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._log_cache_lock:
+            entry = self._log_cache.get(key)
+            if entry is not None:
+                self._log_cache.move_to_end(key)
+            return entry
+
+    def _remember(self, key, generation, messages):
+        with self._log_cache_lock:
+            entry = self._log_cache.get(key)
+            # Reading an old checkpoint must not replace a newer generation
+            if entry is not None and entry[0] > generation:
+                return
+            self._log_cache[key] = (generation, messages)
+            self._log_cache.move_to_end(key)
+            while len(self._log_cache) > MESSAGE_LOG_CACHE_THREADS:
+                self._log_cache.popitem(last=False)
+
+    def _forget(self, thread_id):
+        with self._log_cache_lock:
+            for key in [k for k in self._log_cache if k[0] == thread_id]:
+                del self._log_cache[key]
+
+    @staticmethod
+    def _key(config):
+        return config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", "")
+
+    @staticmethod
+    def _messages(checkpoint):
+        """The full message list to move into the log, or None."""
+        messages = checkpoint["channel_values"].get(MESSAGES_CHANNEL)
+        return messages if isinstance(messages, list) else None
+
+    @staticmethod
+    def _with_ref(checkpoint, generation, hwm):
+        channel_values = {**checkpoint["channel_values"], MESSAGES_CHANNEL: log_ref(generation, hwm)}
+        return {**checkpoint, "channel_values": channel_values}
+
+    def _plan_append(self, key, messages, stored, generation):
+        """
+        Returns (rows to upsert, generation for this write). Any change below
+        the stored length, or a shorter list, is a rewrite: new generation.
+        """
+        rows = self._changed_rows(key, messages, stored)
+        if len(messages) < len(stored) or (rows and rows[0][2] < len(stored)):
+            generation += 1
+        return rows, generation
+
+    def _cached_view(self, key, generation):
+        """Cached messages valid for a checkpoint of `generation` ([] if none)."""
+        entry = self._cached(key)
+        if entry is None or entry[0] != generation:
+            return []
+        return entry[1]
+
+    def _changed_rows(self, key, messages, stored):
+        """
+        Rows for positions the log doesn't hold yet (or holds a different message).
+        `stored` is either the cached message list or a list of stored message ids.
+        """
+        thread_id, checkpoint_ns = key
+        rows = []
+        for seq, m in enumerate(messages):
+            if seq < len(stored):
+                old = stored[seq]
+                if isinstance(old, str) or old is None:
+                    if old == m.id:
+                        continue
+                elif old is m or old == m:
+                    continue
+            rows.append((thread_id, checkpoint_ns, seq, m.id, *self.serde.dumps_typed(m)))
+        return rows
+
+    def _load_rows(self, rows):
+        return [self.serde.loads_typed((r["type"], r["blob"])) for r in rows]
+
+
+class MessageLogSaver(_MessageLogMixin, PostgresSaver):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_log_cache()
+
+    def setup(self):
+        super().setup()
+        with self._cursor() as cur:
+            cur.execute(CREATE_MESSAGE_LOG_SQL)
+            cur.execute(CREATE_LOG_GENERATIONS_SQL)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        messages = self._messages(checkpoint)
+        if messages is not None:
+            generation = self._append(self._key(config), messages)
+            checkpoint = self._with_ref(checkpoint, generation, len(messages))
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def _append(self, key, messages):
+        entry = self._cached(key)
+        if entry is None:
+            with self._cursor() as cur:
+                cur.execute(SELECT_GENERATION_SQL, key)
+                row = cur.fetchone()
+                cur.execute(SELECT_MESSAGE_IDS_SQL, key)
+                entry = (row["generation"] if row else 0, [r["message_id"] for r in cur.fetchall()])
+        generation, stored = entry
+        rows, new_generation = self._plan_append(key, messages, stored, generation)
+        if rows or len(messages) < len(stored):
+            with self._cursor() as cur, cur.connection.transaction():
+                if rows:
+                    cur.executemany(UPSERT_MESSAGE_SQL, rows)
+                cur.execute(TRUNCATE_LOG_SQL, (*key, len(messages)))
+                if new_generation != generation:
+                    cur.execute(UPSERT_GENERATION_SQL, (*key, new_generation))
+        self._remember(key, new_generation, list(messages))
+        return new_generation
+
+    def _rehydrate(self, saved):
+        if saved is None:
+            return None
+        ref = parse_log_ref(saved.checkpoint["channel_values"].get(MESSAGES_CHANNEL))
+        if ref is None:
+            return saved
+        generation, hwm = ref
+        key = self._key(saved.config)
+        cached = self._cached_view(key, generation)
+        if len(cached) < hwm:
+            # Only the tail this process hasn't seen yet is read and deserialized
+            with self._cursor() as cur:
+                cur.execute(SELECT_MESSAGES_SQL, (*key, len(cached), hwm))
+                cached = cached + self._load_rows(cur.fetchall())
+            self._remember(key, generation, cached)
+        saved.checkpoint["channel_values"][MESSAGES_CHANNEL] = cached[:hwm]
+        return saved
+
+    def get_tuple(self, config):
+        return self._rehydrate(super().get_tuple(config))
+
+    def list(self, config, **kwargs):
+        for saved in super().list(config, **kwargs):
+            yield self._rehydrate(saved)
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self._cursor() as cur:
+            cur.execute(DELETE_MESSAGES_SQL, (str(thread_id),))
+            cur.execute(DELETE_GENERATIONS_SQL, (str(thread_id),))
+        self._forget(thread_id)
+
+
+class AsyncMessageLogSaver(_MessageLogMixin, AsyncPostgresSaver):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_log_cache()
+
+    async def setup(self):
+        await super().setup()
+        async with self._cursor() as cur:
+            await cur.execute(CREATE_MESSAGE_LOG_SQL)
+            await cur.execute(CREATE_LOG_GENERATIONS_SQL)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        messages = self._messages(checkpoint)
+        if messages is not None:
+            generation = await self._aappend(self._key(config), messages)
+            checkpoint = self._with_ref(checkpoint, generation, len(messages))
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def _aappend(self, key, messages):
+        entry = self._cached(key)
+        if entry is None:
+            async with self._cursor() as cur:
+                await cur.execute(SELECT_GENERATION_SQL, key)
+                row = await cur.fetchone()
+                await cur.execute(SELECT_MESSAGE_IDS_SQL, key)
+                entry = (row["generation"] if row else 0, [r["message_id"] for r in await cur.fetchall()])
+        generation, stored = entry
+        rows, new_generation = self._plan_append(key, messages, stored, generation)
+        if rows or len(messages) < len(stored):
+            async with self._cursor() as cur, cur.connection.transaction():
+                if rows:
+                    await cur.executemany(UPSERT_MESSAGE_SQL, rows)
+                await cur.execute(TRUNCATE_LOG_SQL, (*key, len(messages)))
+                if new_generation != generation:
+                    await cur.execute(UPSERT_GENERATION_SQL, (*key, new_generation))
+        self._remember(key, new_generation, list(messages))
+        return new_generation
+
+    async def _arehydrate(self, saved):
+        if saved is None:
+            return None
+        ref = parse_log_ref(saved.checkpoint["channel_values"].get(MESSAGES_CHANNEL))
+        if ref is None:
+            return saved
+        generation, hwm = ref
+        key = self._key(saved.config)
+        cached = self._cached_view(key, generation)
+        if len(cached) < hwm:
+            async with self._cursor() as cur:
+                await cur.execute(SELECT_MESSAGES_SQL, (*key, len(cached), hwm))
+                cached = cached + self._load_rows(await cur.fetchall())
+            self._remember(key, generation, cached)
+        saved.checkpoint["channel_values"][MESSAGES_CHANNEL] = cached[:hwm]
+        return saved
+
+    async def aget_tuple(self, config):
+        return await self._arehydrate(await super().aget_tuple(config))
+
+    async def alist(self, config, **kwargs):
+        async for saved in super().alist(config, **kwargs):
+            yield await self._arehydrate(saved)
+
+    async def adelete_thread(self, thread_id):
+        await super().adelete_thread(thread_id)
+        async with self._cursor() as cur:
+            await cur.execute(DELETE_MESSAGES_SQL, (str(thread_id),))
+            await cur.execute(DELETE_GENERATIONS_SQL, (str(thread_id),))
+        self._forget(thread_id)
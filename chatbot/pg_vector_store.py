@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+from psycopg import sql
+
+from schema import ensure_schema
+
+# ======================================================
+# pgvector Document Store
+# ======================================================
+# Document chunks and their embeddings in the Postgres we already run for
+# the checkpointer, queried through the same pool. Cosine distance with an
+# HNSW index; metadata filters are plain WHERE clauses (source column and
+# JSONB containment on metadata).
+#
+# pgvector applies filters after the HNSW scan, so a selective filter can
+# return fewer than k rows; filtered queries raise hnsw.ef_search to keep
+# enough candidates (pgvector >= 0.8 can use hnsw.iterative_scan instead).
+
+PG_VECTOR_TABLE = os.getenv("PG_VECTOR_TABLE", "rag_chunks")
+PG_VECTOR_HNSW_M = int(os.getenv("PG_VECTOR_HNSW_M", "16"))
+PG_VECTOR_EF_CONSTRUCTION = int(os.getenv("PG_VECTOR_EF_CONSTRUCTION", "64"))
+# Server default is 40; recall@10 drops below 0.8 around 50k chunks with it
+# (bench_pgvector.py). 0 keeps the server default and skips the SET LOCAL.
+PG_VECTOR_EF_SEARCH = int(os.getenv("PG_VECTOR_EF_SEARCH", "100"))
+PG_VECTOR_FILTERED_EF_SEARCH = int(os.getenv("PG_VECTOR_FILTERED_EF_SEARCH", "200"))
+# The HNSW build is much faster when the graph fits in maintenance_work_mem
+PG_VECTOR_BUILD_MEMORY = os.getenv("PG_VECTOR_BUILD_MEMORY", "512MB")
+
+# Bump when the DDL below changes (see schema.py)
+STORE_SCHEMA_VERSION = 2
+
+CREATE_TABLE_SQL = """
+CREATE EXTENSION IF NOT EXISTS vector;
+CREATE TABLE IF NOT EXISTS {table} (
+    id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL DEFAULT 0,
+    content TEXT NOT NULL,
+    content_hash TEXT NOT NULL DEFAULT '',
+    metadata JSONB NOT NULL DEFAULT '{{}}',
+    embedding vector({dim}) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Tables created at version 1
+ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash TEXT NOT NULL DEFAULT '';
+CREATE INDEX IF NOT EXISTS {source_index} ON {table} (source, chunk_index);
+CREATE INDEX IF NOT EXISTS {metadata_index} ON {table} USING gin (metadata jsonb_path_ops);
+"""
+
+CREATE_HNSW_SQL = """
+CREATE INDEX IF NOT EXISTS {hnsw_index} ON {table}
+    USING hnsw (embedding vector_cosine_ops) WITH (m = {m}, ef_construction = {ef_construction})
+"""
+
+COPY_CHUNKS_SQL = """
+COPY {table} (source, chunk_index, content, content_hash, metadata, embedding) FROM STDIN (FORMAT BINARY)
+"""
+
+CHUNK_HASHES_SQL = "SELECT id, source, content_hash FROM {table}"
+
+DELETE_CHUNKS_SQL = "DELETE FROM {table} WHERE id = ANY(%s)"
+
+MISSING_CHUNKS_SQL = """
+SELECT ids.id FROM unnest(%s::bigint[]) AS ids(id)
+WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.id = ids.id)
+"""
+
+# Binary COPY framing: signature, flags, header extension length ... -1 field count
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+
+ITER_CHUNKS_SQL = """
+SELECT id, source, chunk_index, content AS text, metadata FROM {table}
+WHERE id > %s ORDER BY id LIMIT %s
+"""
+
+GET_CHUNKS_SQL = """
+SELECT id, source, chunk_index, content AS text, metadata FROM {table}
+WHERE id = ANY(%(ids)s) {filters}
+"""
+
+SEARCH_SQL = """
+SELECT id, source, chunk_index, content AS text, metadata,
+       1 - (embedding <=> %(embedding)s::vector) AS score
+FROM {table}
+{where}
+ORDER BY embedding <=> %(embedding)s::vector
+LIMIT %(k)s
+"""
+
+
+def vector_literal(embedding):
+    """pgvector's text format, so no client-side type adapter is needed."""
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+def _copy_row(chunk, embedding):
+    """One row in binary COPY format. Formatting 768 floats as text costs far
+    more than the COPY itself; pgvector's binary input is dim, unused, then
+    big-endian float4s, straight from NumPy."""
+    fields = (
+        chunk["source"].encode(),
+        struct.pack("!i", chunk.get("chunk_index", 0)),
+        chunk["text"].encode(),
+        chunk.get("hash", "").encode(),
+        b"\x01" + json.dumps(chunk.get("metadata") or {}).encode(),  # jsonb version 1
+        struct.pack("!hh", len(embedding), 0) + embedding.tobytes(),
+    )
+    return struct.pack("!h", len(fields)) + b"".join(struct.pack("!i", len(f)) + f for f in fields)
+
+
+class PgVectorStore:
+    def __init__(self, pool, dim, table=PG_VECTOR_TABLE, async_pool=None):
+        self.pool = pool
+        self.async_pool = async_pool
+        self.dim = dim
+        self.table = table
+        self._names = {
+            "table": sql.Identifier(table),
+            "source_index": sql.Identifier(f"{table}_source_idx"),
+            "metadata_index": sql.Identifier(f"{table}_metadata_idx"),
+            "hnsw_index": sql.Identifier(f"{table}_embedding_hnsw_idx"),
+            "dim": sql.Literal(dim),
+            "m": sql.Literal(PG_VECTOR_HNSW_M),
+            "ef_construction": sql.Literal(PG_VECTOR_EF_CONSTRUCTION),
+        }
+
+    def _sql(self, template, **kwargs):
+        return sql.SQL(template).format(**self._names, **kwargs)
+
+    # ---------- schema ----------
+
+    def setup(self, with_index=True):
+        """Create the table (and the HNSW index). For a large first load, pass
+        with_index=False, COPY everything, then create_index(): building the
+        graph once is much faster than inserting into it row by row."""
+        with self.pool.connection() as conn:
+            conn.execute(self._sql(CREATE_TABLE_SQL))
+        if with_index:
+            self.create_index()
+
+    def create_index(self):
+        with self.pool.connection() as conn, conn.transaction():
+            # A build over a large table outlasts the per-query statement timeout
+            conn.execute("SET LOCAL statement_timeout = 0")
+            conn.execute("SELECT set_config('maintenance_work_mem', %s, true)", (PG_VECTOR_BUILD_MEMORY,))
+            conn.execute(self._sql(CREATE_HNSW_SQL))
+
+    def ensure_schema(self):
+        # The dimension is part of the stamp: a new embedding model needs a new table
+        return ensure_schema(self.pool, f"rag:{self.table}", f"{STORE_SCHEMA_VERSION}.{self.dim}", self.setup)
+
+    # ---------- writes ----------
+
+    def add(self, chunks, embeddings):
+        """
+        Bulk-insert chunks ({"source", "text", "chunk_index"?, "hash"?, "metadata"?})
+        with their embeddings in one COPY. Returns the number of rows.
+        """
+        embeddings = np.asarray(embeddings, dtype=">f4")
+        if len(chunks) != len(embeddings):
+            raise ValueError("chunks and embeddings must have the same length")
+        if len(chunks) and embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim embeddings, got {embeddings.shape[1]}")
+        rows = 0
+        with self.pool.connection() as conn, conn.transaction():
+            with conn.cursor().copy(self._sql(COPY_CHUNKS_SQL)) as copy:
+                copy.write(COPY_HEADER)
+                for chunk, embedding in zip(chunks, embeddings):
+                    copy.write(_copy_row(chunk, embedding))
+                    rows += 1
+                copy.write(COPY_TRAILER)
+        return rows
+
+    def delete(self, ids):
+        if not ids:
+            return 0
+        with self.pool.connection() as conn:
+            return conn.execute(self._sql(DELETE_CHUNKS_SQL), (list(ids),)).rowcount
+
+    # ---------- reads ----------
+
+    def chunk_hashes(self):
+        """{source: {content hash: [ids]}} (see ingest.py)."""
+        hashes = {}
+        with self.pool.connection() as conn:
+            for row in conn.execute(self._sql(CHUNK_HASHES_SQL)):
+                hashes.setdefault(row["source"], {}).setdefault(row["content_hash"], []).append(row["id"])
+        return hashes
+
+    def _filter_clauses(self, filters, params):
+        clauses, filters = [], dict(filters or {})
+        if "source" in filters:
+            clauses.append(sql.SQL("source = %(source)s"))
+            params["source"] = filters.pop("source")
+        if filters:
+            clauses.append(sql.SQL("metadata @> %(metadata)s::jsonb"))
+            params["metadata"] = json.dumps(filters)
+        return clauses
+
+    def _search_query(self, embedding, k, filters):
+        params = {"embedding": vector_literal(embedding), "k": k}
+        clauses = self._filter_clauses(filters, params)
+        where = sql.SQL("WHERE ") + sql.SQL(" AND ").join(clauses) if clauses else sql.SQL("")
+        ef_search = PG_VECTOR_FILTERED_EF_SEARCH if clauses else PG_VECTOR_EF_SEARCH
+        return self._sql(SEARCH_SQL, where=where), params, max(ef_search, k) if ef_search else 0
+
+    def _get_query(self, ids, filters):
+        params = {"ids": list(ids)}
+        clauses = self._filter_clauses(filters, params)
+        return self._sql(GET_CHUNKS_SQL, filters=sql.SQL("").join([sql.SQL(" AND ") + c for c in clauses])), params
+
+    def get_docs(self, ids, filters=None):
+        """{id: chunk} for the given ids that still exist and match `filters`."""
+        if not ids:
+            return {}
+        query, params = self._get_query(ids, filters)
+        with self.pool.connection() as conn:
+            return {row["id"]: row for row in conn.execute(query, params).fetchall()}
+
+    async def aget_docs(self, ids, filters=None):
+        if not ids:
+            return {}
+        query, params = self._get_query(ids, filters)
+        async with self.async_pool.connection() as conn:
+            return {row["id"]: row for row in await (await conn.execute(query, params)).fetchall()}
+
+    def iter_docs(self, after_id=-1, batch_size=5000):
+        """Chunks with id > after_id in id order, fetched in keyset pages."""
+        query = self._sql(ITER_CHUNKS_SQL)
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (after_id, batch_size)).fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def missing_ids(self, ids):
+        """The ids among `ids` that no longer exist."""
+        if not ids:
+            return []
+        with self.pool.connection() as conn:
+            return [row["id"] for row in conn.execute(self._sql(MISSING_CHUNKS_SQL), (list(ids),))]
+
+    def top_k(self, embedding, k=4, filters=None):
+        """Best k chunks for one query embedding: [{"source", "text", "score", ...}]."""
+        query, params, ef_search = self._search_query(embedding, k, filters)
+        with self.pool.connection() as conn:
+            if not ef_search:
+                return conn.execute(query, params).fetchall()
+            # SET LOCAL needs a transaction; it ends with it, so the pooled
+            # connection goes back with the server default
+            with conn.transaction():
+                conn.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+                return conn.execute(query, params).fetchall()
+
+    async def atop_k(self, embedding, k=4, filters=None):
+        query, params, ef_search = self._search_query(embedding, k, filters)
+        async with self.async_pool.connection() as conn:
+            if not ef_search:
+                return await (await conn.execute(query, params)).fetchall()
+            async with conn.transaction():
+                await conn.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+                return await (await conn.execute(query, params)).fetchall()
+
+    def search_docs(self, queries, k=4, filters=None):
+        """Same shape as VectorIndex.search_docs: one list of chunks per query embedding."""
+        return [self.top_k(embedding, k, filters) for embedding in queries]
+
+    def count(self):
+        with self.pool.connection() as conn:
+            return conn.execute(self._sql("SELECT count(*) AS n FROM {table}")).fetchone()["n"]
+
+
+if __name__ == "__main__":
+    # python pg_vector_store.py setup --dim 768
+    # python pg_vector_store.py count
+    from init_db import get_pool
+
+    parser = argparse.ArgumentParser(description="pgvector document store maintenance")
+    parser.add_argument("command", choices=["setup", "count"])
+    parser.add_argument("--dim", type=int, default=int(os.getenv("RAG_EMBEDDING_DIM", "768")))
+    parser.add_argument("--table", default=PG_VECTOR_TABLE)
+    args = parser.parse_args()
+
+    store = PgVectorStore(get_pool(), args.dim, table=args.table)
+    if args.command == "setup":
+        store.ensure_schema()
+    print({"table": args.table, "dim": args.dim, "rows": store.count()})
@@ -0,0 +1,56 @@
+# ======================================================
+# Schema Version Stamps
+# ======================================================
+# Each setup path (checkpointer migrations, thread catalog, UI projection...)
+# runs a handful of DDL statements and catalog lookups. On a warm database
+# they are all no-ops, so a component records the version it was set up at
+# and later process starts skip setup with two cheap SELECTs.
+# Bump the version passed to ensure_schema whenever its setup changes.
+
+CREATE_SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS app_schema_version (
+    component TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+TABLE_EXISTS_SQL = "SELECT to_regclass('app_schema_version') IS NOT NULL AS present"
+
+SELECT_VERSION_SQL = "SELECT version FROM app_schema_version WHERE component = %s"
+
+MARK_VERSION_SQL = """
+INSERT INTO app_schema_version (component, version) VALUES (%s, %s)
+ON CONFLICT (component) DO UPDATE SET version = EXCLUDED.version, updated_at = now()
+"""
+
+
+def ensure_schema(pool, component, version, setup):
+    """Run `setup()` unless `component` is already stamped with `version`. Returns True if setup ran."""
+    version = str(version)
+    with pool.connection() as conn:
+        # The table is missing on the first start against a fresh database
+        if conn.execute(TABLE_EXISTS_SQL).fetchone()["present"]:
+            row = conn.execute(SELECT_VERSION_SQL, (component,)).fetchone()
+            if row and row["version"] == version:
+                return False
+    setup()
+    with pool.connection() as conn:
+        conn.execute(CREATE_SCHEMA_VERSION_SQL)
+        conn.execute(MARK_VERSION_SQL, (component, version))
+    return True
+
+
+async def aensure_schema(async_pool, component, version, setup):
+    """Async counterpart of ensure_schema; `setup` is a coroutine function."""
+    version = str(version)
+    async with async_pool.connection() as conn:
+        if (await (await conn.execute(TABLE_EXISTS_SQL)).fetchone())["present"]:
+            row = await (await conn.execute(SELECT_VERSION_SQL, (component,))).fetchone()
+            if row and row["version"] == version:
+                return False
+    await setup()
+    async with async_pool.connection() as conn:
+        await conn.execute(CREATE_SCHEMA_VERSION_SQL)
+        await conn.execute(MARK_VERSION_SQL, (component, version))
+    return True
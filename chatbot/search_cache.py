@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.tools import StructuredTool
+
+# ======================================================
+# Search Result Cache
+# ======================================================
+# The model often repeats the same web search inside a turn and across threads.
+# Results are cached by normalized query: in memory (TTL + LRU) and,
+# optionally, in a SQLite file so warm results survive restarts.
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+# e.g. SEARCH_CACHE_DB=search_cache.sqlite3; unset = memory only
+SEARCH_CACHE_DB = os.getenv("SEARCH_CACHE_DB")
+# The SQLite file is pruned every SEARCH_CACHE_PURGE_EVERY writes: expired rows
+# go, then the soonest-expiring ones until at most SEARCH_CACHE_DB_ROWS remain
+SEARCH_CACHE_DB_ROWS = int(os.getenv("SEARCH_CACHE_DB_ROWS", "10000"))
+SEARCH_CACHE_PURGE_EVERY = 100
+
+
+def normalize_query(query):
+    """'  Apple  Stock NEWS ' and 'apple stock news' share one cache entry."""
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    def __init__(self, ttl=SEARCH_CACHE_TTL, max_size=SEARCH_CACHE_SIZE, db_path=SEARCH_CACHE_DB,
+                 max_rows=SEARCH_CACHE_DB_ROWS):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_rows = max_rows
+        self._entries = OrderedDict()  # query -> (expires_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        self._writes = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "query TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS search_cache_expires ON search_cache (expires_at)")
+            self._purge_db()
+
+    def get(self, query):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(query)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[query]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT result, expires_at FROM search_cache WHERE query = ? AND expires_at > ?",
+                    (query, now),
+                ).fetchone()
+                if row:
+                    self._put_memory(query, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, query, result):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put_memory(query, result, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (query, result, expires_at) VALUES (?, ?, ?)",
+                    (query, result, expires_at),
+                )
+                self._writes += 1
+                if self._writes % SEARCH_CACHE_PURGE_EVERY == 0:
+                    self._purge_db()
+                else:
+                    self._db.commit()
+
+    def _purge_db(self):
+        self._db.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM search_cache WHERE query IN (SELECT query FROM search_cache ORDER BY expires_at "
+            "LIMIT max(0, (SELECT COUNT(*) FROM search_cache) - ?))",
+            (self.max_rows,),
+        )
+        self._db.commit()
+
+    def _put_memory(self, query, result, expires_at):
+        self._entries[query] = (expires_at, result)
+        self._entries.move_to_end(query)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
+def cached_search_tool(search_tool, cache):
+    """Wrap a search tool; the LLM sees the same name, description and arguments."""
+
+    def run(query: str) -> str:
+        key = normalize_query(query)
+        result = cache.get(key)
+        if result is None:
+            result = search_tool.invoke(query)
+            cache.set(key, result)
+        return result
+
+    async def arun(query: str) -> str:
+        key = normalize_query(query)
+        result = cache.get(key)
+        if result is None:
+            result = await search_tool.ainvoke(query)
+            cache.set(key, result)
+        return result
+
+    return StructuredTool.from_function(
+        func=run,
+        coroutine=arun,
+        name=search_tool.name,
+        description=search_tool.description,
+        args_schema=search_tool.args_schema,
+    )
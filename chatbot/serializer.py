@@ -0,0 +1,112 @@
+import os
+import threading
+
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# ======================================================
+# zstd-compressed Checkpoint Serializer
+# ======================================================
+# Wraps LangGraph's msgpack serializer and zstd-compresses the payload, the
+# same way EncryptedSerializer wraps it: the codec goes into the stored type,
+# e.g. "msgpack+zstd" or "msgpack+zstd:<dict id>" when a trained dictionary
+# was used. Rows whose type has no "+zstd" (everything written before this
+# serializer) are passed straight to the inner serializer.
+
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "zstd")  # "zstd" or "none"
+CHECKPOINT_ZSTD_LEVEL = int(os.getenv("CHECKPOINT_ZSTD_LEVEL", "3"))
+# Optional dictionary trained on chat payloads (see train_dictionary below)
+CHECKPOINT_ZSTD_DICT = os.getenv("CHECKPOINT_ZSTD_DICT")
+
+ZSTD = "zstd"
+
+
+class ZstdSerializer(SerializerProtocol):
+    def __init__(self, serde=None, level=CHECKPOINT_ZSTD_LEVEL, min_size=128, dictionary=None, extra_dictionaries=()):
+        """
+        Payloads under `min_size` bytes are stored uncompressed (not worth a frame header).
+        `extra_dictionaries` are older dictionaries still needed to read existing rows.
+        """
+        self.serde = serde or JsonPlusSerializer()
+        self.level = level
+        self.min_size = min_size
+        self.dictionary = dictionary
+        self.dictionaries = {d.dict_id(): d for d in (dictionary, *extra_dictionaries) if d is not None}
+        # zstd (de)compressor objects must not be shared between threads
+        self._local = threading.local()
+
+    def _compressor(self):
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self.dictionary)
+        return self._local.compressor
+
+    def _decompressor(self, dict_id):
+        cache = self._local.__dict__.setdefault("decompressors", {})
+        if dict_id not in cache:
+            dictionary = self.dictionaries[dict_id] if dict_id else None
+            cache[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return cache[dict_id]
+
+    def dumps_typed(self, obj):
+        typ, data = self.serde.dumps_typed(obj)
+        if data is None or len(data) < self.min_size:
+            return typ, data
+        compressed = self._compressor().compress(data)
+        if len(compressed) >= len(data):
+            return typ, data
+        codec = f"{ZSTD}:{self.dictionary.dict_id()}" if self.dictionary else ZSTD
+        return f"{typ}+{codec}", compressed
+
+    def loads_typed(self, data):
+        typ, payload = data
+        if "+" not in typ:
+            # Uncompressed row (older data or below min_size)
+            return self.serde.loads_typed(data)
+        typ, codec = typ.split("+", 1)
+        name, _, dict_id = codec.partition(":")
+        if name != ZSTD:
+            raise ValueError(f"Unsupported checkpoint codec: {codec}")
+        raw = self._decompressor(int(dict_id) if dict_id else 0).decompress(payload)
+        return self.serde.loads_typed((typ, raw))
+
+
+def train_dictionary(samples, size=64 * 1024):
+    """Train a zstd dictionary from serialized payloads (e.g. existing checkpoint blobs)."""
+    return zstandard.train_dictionary(size, samples)
+
+
+def load_dictionary(path):
+    with open(path, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+def make_serializer():
+    """Serializer for the Postgres checkpointers, configured from the environment."""
+    if CHECKPOINT_COMPRESSION == "none":
+        # Still able to read rows written while compression was on
+        return ZstdSerializer(min_size=float("inf"))
+    dictionary = load_dictionary(CHECKPOINT_ZSTD_DICT) if CHECKPOINT_ZSTD_DICT else None
+    return ZstdSerializer(dictionary=dictionary)
+
+
+if __name__ == "__main__":
+    # python serializer.py train chat.dict  -> trains on existing checkpoint blobs
+    import sys
+
+    from init_db import get_pool
+
+    pool = get_pool()
+
+    if len(sys.argv) != 3 or sys.argv[1] != "train":
+        sys.exit("usage: python serializer.py train <output.dict>")
+
+    serde = ZstdSerializer(min_size=float("inf"))
+    with pool.connection() as conn:
+        rows = conn.execute("SELECT type, blob FROM checkpoint_blobs WHERE blob IS NOT NULL LIMIT 5000").fetchall()
+    # Train on the uncompressed msgpack bytes, whatever the rows were stored as
+    samples = [serde.serde.dumps_typed(serde.loads_typed((r["type"], r["blob"])))[1] for r in rows]
+    dictionary = train_dictionary(samples)
+    with open(sys.argv[2], "wb") as f:
+        f.write(dictionary.as_bytes())
+    print(f"Trained dictionary {dictionary.dict_id()} from {len(samples)} blobs -> {sys.argv[2]}")
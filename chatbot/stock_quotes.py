@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import httpx
+
+# ======================================================
+# Stock Quote Client
+# ======================================================
+# - one pooled HTTP client per process (keep-alive, no TLS handshake per call)
+# - per-symbol TTL + LRU cache, so repeated questions don't burn the API rate limit
+# - single-flight: concurrent requests for the same symbol share one HTTP call
+
+# Point this at a local stub server in tests
+STOCK_API_BASE_URL = os.getenv("STOCK_API_BASE_URL", "https://www.alphavantage.co")
+STOCK_QUOTE_TTL = float(os.getenv("STOCK_QUOTE_TTL", "60"))
+STOCK_API_TIMEOUT = float(os.getenv("STOCK_API_TIMEOUT", "10"))
+# Symbols are typed by users, so the cache is bounded like the other caches
+STOCK_QUOTE_CACHE_SIZE = int(os.getenv("STOCK_QUOTE_CACHE_SIZE", "1024"))
+
+
+class QuoteClient:
+    def __init__(self, api_key, base_url=STOCK_API_BASE_URL, ttl=STOCK_QUOTE_TTL,
+                 timeout=STOCK_API_TIMEOUT, max_connections=20, max_size=STOCK_QUOTE_CACHE_SIZE):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ttl = ttl
+        self.max_size = max_size
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+        self._client = None
+        self._aclient = None
+        self._cache = OrderedDict()  # symbol -> (expires_at, quote)
+        self._inflight = {}   # symbol -> Future shared by concurrent sync callers
+        self._ainflight = {}  # symbol -> Task shared by concurrent async callers
+        self._lock = threading.Lock()
+
+    # ---------- cache ----------
+
+    def _cached(self, symbol):
+        entry = self._cache.get(symbol)
+        if entry and entry[0] > time.monotonic():
+            self._cache.move_to_end(symbol)
+            return entry[1]
+        if entry:
+            del self._cache[symbol]
+        return None
+
+    def _store(self, symbol, quote):
+        # Rate-limit notes and errors come back as 200s without a quote; never cache those
+        if quote.get("Global Quote"):
+            self._cache[symbol] = (time.monotonic() + self.ttl, quote)
+            self._cache.move_to_end(symbol)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return quote
+
+    def _params(self, symbol):
+        return {"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": self.api_key}
+
+    # ---------- sync ----------
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    def get_quote(self, symbol):
+        symbol = symbol.strip().upper()
+        with self._lock:
+            quote = self._cached(symbol)
+            if quote is not None:
+                return quote
+            future = self._inflight.get(symbol)
+            leader = future is None
+            if leader:
+                future = self._inflight[symbol] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            r = self.client.get("/query", params=self._params(symbol))
+            r.raise_for_status()
+            with self._lock:
+                quote = self._store(symbol, r.json())
+            future.set_result(quote)
+            return quote
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+
+    # ---------- async ----------
+
+    @property
+    def aclient(self):
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._aclient
+
+    async def _afetch(self, symbol):
+        try:
+            r = await self.aclient.get("/query", params=self._params(symbol))
+            r.raise_for_status()
+            with self._lock:
+                return self._store(symbol, r.json())
+        finally:
+            self._ainflight.pop(symbol, None)
+
+    async def aget_quote(self, symbol):
+        symbol = symbol.strip().upper()
+        with self._lock:
+            quote = self._cached(symbol)
+        if quote is not None:
+            return quote
+
+        task = self._ainflight.get(symbol)
+        if task is None:
+            task = self._ainflight[symbol] = asyncio.ensure_future(self._afetch(symbol))
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(task)
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+    async def aclose(self):
+        self.close()
+        if self._aclient is not None:
+            await self._aclient.aclose()
@@ -0,0 +1,52 @@
+import os
+import time
+
+# ======================================================
+# Throttled Stream Rendering
+# ======================================================
+# st.markdown re-renders the whole accumulated answer on every call, so
+# rendering once per token is quadratic in the answer length and floods the
+# websocket. The renderer below coalesces chunks and only re-renders when
+# STREAM_RENDER_INTERVAL seconds have passed or STREAM_RENDER_CHARS new
+# characters are pending. The first chunk is shown immediately, and
+# flush() at the end shows whatever is left.
+
+STREAM_RENDER_INTERVAL = float(os.getenv("STREAM_RENDER_INTERVAL", "0.08"))
+STREAM_RENDER_CHARS = int(os.getenv("STREAM_RENDER_CHARS", "400"))
+
+
+class ThrottledRenderer:
+    def __init__(self, render, interval=STREAM_RENDER_INTERVAL, max_chars=STREAM_RENDER_CHARS, clock=time.monotonic):
+        """`render(text)` is called with the full text so far, e.g. placeholder.markdown."""
+        self.render = render
+        self.interval = interval
+        self.max_chars = max_chars
+        self.clock = clock
+        self.text = ""
+        self.chunks = 0
+        self.renders = 0
+        self._pending = 0
+        self._last_render = None
+
+    def push(self, chunk):
+        if not chunk:
+            return
+        self.text += chunk
+        self.chunks += 1
+        self._pending += len(chunk)
+        now = self.clock()
+        if (self._last_render is None
+                or now - self._last_render >= self.interval
+                or self._pending >= self.max_chars):
+            self._render(now)
+
+    def flush(self):
+        """Render pending text now (end of stream, or before the stream pauses for a tool)."""
+        if self._pending:
+            self._render(self.clock())
+
+    def _render(self, now):
+        self.render(self.text)
+        self.renders += 1
+        self._pending = 0
+        self._last_render = now
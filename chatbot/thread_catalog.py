@@ -0,0 +1,277 @@
+import argparse
+import threading
+from collections import OrderedDict
+
+import psycopg
+from langchain_core.messages import HumanMessage
+
+# ======================================================
+# Thread Catalog
+# ======================================================
+# One row per conversation, written by the graph on every turn.
+# The sidebar reads this table instead of scanning every checkpoint.
+
+CREATE_CATALOG_SQL = """
+CREATE TABLE IF NOT EXISTS thread_catalog (
+    thread_id TEXT PRIMARY KEY,
+    title TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS thread_catalog_last_updated_idx
+    ON thread_catalog (last_updated_at DESC, thread_id DESC);
+"""
+
+# Lets "title ILIKE '%...%'" use an index. Needs the pg_trgm extension,
+# so it is optional: without it search still works, just with a scan.
+CREATE_SEARCH_INDEX_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS thread_catalog_title_trgm_idx
+    ON thread_catalog USING gin (title gin_trgm_ops);
+"""
+
+UPSERT_THREAD_SQL = """
+INSERT INTO thread_catalog (thread_id, title, message_count)
+VALUES (%s, %s, %s)
+ON CONFLICT (thread_id) DO UPDATE SET
+    title = COALESCE(thread_catalog.title, EXCLUDED.title),
+    message_count = EXCLUDED.message_count,
+    last_updated_at = now()
+"""
+
+THREAD_TITLES_SQL = """
+SELECT thread_id, title FROM thread_catalog
+WHERE thread_id = ANY(%s)
+"""
+
+LIST_THREADS_SQL = """
+SELECT thread_id, title, created_at, last_updated_at, message_count
+FROM thread_catalog
+{where}
+ORDER BY last_updated_at DESC, thread_id DESC
+LIMIT %s
+"""
+
+# Timestamps come from the "ts" field LangGraph stores inside every checkpoint.
+BACKFILL_THREADS_SQL = """
+INSERT INTO thread_catalog (thread_id, created_at, last_updated_at)
+SELECT thread_id,
+       MIN((checkpoint->>'ts')::timestamptz),
+       MAX((checkpoint->>'ts')::timestamptz)
+FROM checkpoints
+WHERE checkpoint_ns = ''
+GROUP BY thread_id
+ON CONFLICT (thread_id) DO NOTHING
+"""
+
+UNTITLED_THREADS_SQL = """
+SELECT thread_id FROM thread_catalog
+WHERE title IS NULL AND message_count = 0
+ORDER BY thread_id
+LIMIT %s
+"""
+
+SET_THREAD_DETAILS_SQL = """
+UPDATE thread_catalog SET title = %s, message_count = %s
+WHERE thread_id = %s
+"""
+
+
+def setup_thread_catalog(pool):
+    """Create the catalog table and its index (safe to run repeatedly)."""
+    with pool.connection() as conn:
+        conn.execute(CREATE_CATALOG_SQL)
+    try:
+        with pool.connection() as conn:
+            conn.execute(CREATE_SEARCH_INDEX_SQL)
+    except psycopg.Error as e:
+        print(f"Thread search index not created ({e}); search will scan the catalog")
+
+
+def make_title(messages, length=20):
+    """Title a thread by its first user message."""
+    for m in messages:
+        if isinstance(m, HumanMessage):
+            text = m.content if isinstance(m.content, str) else str(m.content)
+            return (text[:length] + "...") if len(text) > length else text
+    return None
+
+
+def upsert_thread(pool, thread_id, title, message_count):
+    """Record activity on a thread. The first non-empty title is kept."""
+    with pool.connection() as conn:
+        conn.execute(UPSERT_THREAD_SQL, (thread_id, title, message_count))
+    if title and _cached_title(thread_id) is None:
+        _cache_title(thread_id, title)
+
+
+# ======================================================
+# Title Lookup (batched + cached in-process)
+# ======================================================
+# A title never changes once stored, so cached entries never go stale.
+
+TITLE_CACHE_SIZE = 2048
+_title_cache = OrderedDict()
+_title_lock = threading.Lock()
+
+
+def _cached_title(thread_id):
+    with _title_lock:
+        title = _title_cache.get(thread_id)
+        if title is not None:
+            _title_cache.move_to_end(thread_id)
+        return title
+
+
+def _cache_title(thread_id, title):
+    with _title_lock:
+        _title_cache[thread_id] = title
+        _title_cache.move_to_end(thread_id)
+        while len(_title_cache) > TITLE_CACHE_SIZE:
+            _title_cache.popitem(last=False)
+
+
+def get_thread_titles(pool, thread_ids, default="New Chat"):
+    """
+    Resolve titles for a page of threads.
+    Cache misses are fetched together in a single query.
+    """
+    titles = {}
+    missing = []
+    for tid in thread_ids:
+        title = _cached_title(tid)
+        if title is None:
+            missing.append(tid)
+        else:
+            titles[tid] = title
+
+    if missing:
+        with pool.connection() as conn:
+            rows = conn.execute(THREAD_TITLES_SQL, (missing,)).fetchall()
+        for row in rows:
+            if row["title"]:
+                _cache_title(row["thread_id"], row["title"])
+                titles[row["thread_id"]] = row["title"]
+
+    return {tid: titles.get(tid, default) for tid in thread_ids}
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _list_threads_query(limit, cursor, search):
+    wheres, params = [], []
+    if cursor:
+        # Keyset pagination: seeks straight into the index, no OFFSET scan
+        wheres.append("(last_updated_at, thread_id) < (%s, %s)")
+        params.extend(cursor)
+    if search:
+        wheres.append("title ILIKE %s")
+        params.append(f"%{_escape_like(search.strip())}%")
+
+    where = ("WHERE " + " AND ".join(wheres)) if wheres else ""
+    # Fetch one extra row to know whether another page exists
+    params.append(limit + 1)
+    return LIST_THREADS_SQL.format(where=where), params
+
+
+def _threads_page(rows, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]["last_updated_at"], rows[-1]["thread_id"])
+
+    for row in rows:
+        if row["title"]:
+            _cache_title(row["thread_id"], row["title"])
+    return rows, next_cursor
+
+
+def list_threads(pool, limit=50, cursor=None, search=None):
+    """
+    One page of threads, newest activity first.
+
+    `cursor` is the (last_updated_at, thread_id) of the last row already shown.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    sql, params = _list_threads_query(limit, cursor, search)
+    with pool.connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return _threads_page(rows, limit)
+
+
+# ======================================================
+# Async variants (used by async_chatbot.py with init_db.async_pool)
+# ======================================================
+
+async def asetup_thread_catalog(async_pool):
+    async with async_pool.connection() as conn:
+        await conn.execute(CREATE_CATALOG_SQL)
+
+
+async def aupsert_thread(async_pool, thread_id, title, message_count):
+    async with async_pool.connection() as conn:
+        await conn.execute(UPSERT_THREAD_SQL, (thread_id, title, message_count))
+    if title and _cached_title(thread_id) is None:
+        _cache_title(thread_id, title)
+
+
+async def alist_threads(async_pool, limit=50, cursor=None, search=None):
+    sql, params = _list_threads_query(limit, cursor, search)
+    async with async_pool.connection() as conn:
+        rows = await (await conn.execute(sql, params)).fetchall()
+    return _threads_page(rows, limit)
+
+
+# ======================================================
+# Backfill (for checkpoints written before the catalog existed)
+# ======================================================
+
+def backfill_thread_catalog(pool, checkpointer, batch_size=100):
+    """
+    Populate the catalog from existing Postgres checkpoints.
+    Returns the number of threads whose title/message count were filled in.
+    """
+    setup_thread_catalog(pool)
+    with pool.connection() as conn:
+        conn.execute(BACKFILL_THREADS_SQL)
+
+    filled = 0
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute(UNTITLED_THREADS_SQL, (batch_size,)).fetchall()
+        if not rows:
+            return filled
+
+        for row in rows:
+            thread_id = row["thread_id"]
+            config = {"configurable": {"thread_id": thread_id}}
+            saved = checkpointer.get_tuple(config)
+            messages = saved.checkpoint["channel_values"].get("messages", []) if saved else []
+            # "New Chat" marks threads that have no user message so they are not picked up again
+            title = make_title(messages) or "New Chat"
+            with pool.connection() as conn:
+                conn.execute(SET_THREAD_DETAILS_SQL, (title, len(messages), thread_id))
+            filled += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Thread catalog maintenance")
+    parser.add_argument("command", choices=["setup", "backfill"])
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    from init_db import get_pool
+
+    pool = get_pool()
+
+    if args.command == "setup":
+        setup_thread_catalog(pool)
+        print("thread_catalog is ready")
+    else:
+        # The app's own saver: same serializer, and the message log when MESSAGE_STORE=log
+        from chatbot import get_checkpointer
+        count = backfill_thread_catalog(pool, get_checkpointer(), args.batch_size)
+        print(f"Backfilled {count} threads")
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from init_db import async_lock_pool, get_lock_pool
+
+# ======================================================
+# Per-Thread Locks
+# ======================================================
+# A turn and a summary write on the same conversation must not interleave,
+# otherwise both fork from the same checkpoint. The lock lives in Postgres
+# (a transaction-scoped advisory lock per thread id), so any API worker or
+# replica can serve any thread; unrelated conversations never wait on each
+# other.
+#
+# Within a process, callers first queue on an in-process lock per thread
+# id (created on first use, dropped once nobody holds or waits for it), so
+# only the one about to run holds a connection from the lock pool.
+
+# First key of pg_advisory_xact_lock(int, int), keeping these locks apart
+# from other advisory locks; the second key is hashtext(thread_id)
+THREAD_LOCK_NAMESPACE = 0x7468
+
+LOCK_THREAD_SQL = "SELECT pg_advisory_xact_lock(%s, hashtext(%s))"
+
+# A turn can run past the pool's statement_timeout, both while waiting for
+# the lock and while holding it (idle in its transaction)
+NO_TIMEOUTS_SQL = """
+SELECT set_config('statement_timeout', '0', true),
+       set_config('idle_in_transaction_session_timeout', '0', true)
+"""
+
+_locks = {}  # thread_id -> [lock, holders + waiters]
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _process_lock(thread_id):
+    with _locks_guard:
+        entry = _locks.setdefault(thread_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[thread_id]
+
+
+@contextmanager
+def thread_lock(thread_id):
+    """Hold the lock of one conversation, across all processes, for the duration of the block."""
+    with _process_lock(thread_id):
+        with get_lock_pool().connection() as conn, conn.transaction():
+            conn.execute(NO_TIMEOUTS_SQL)
+            conn.execute(LOCK_THREAD_SQL, (THREAD_LOCK_NAMESPACE, thread_id))
+            yield
+
+
+# ======================================================
+# Async variant (used by async_chatbot.py)
+# ======================================================
+# The in-process table is only touched from the event loop, so it needs no guard.
+
+_alocks = {}  # thread_id -> [asyncio.Lock, holders + waiters]
+
+
+@asynccontextmanager
+async def _aprocess_lock(thread_id):
+    entry = _alocks.setdefault(thread_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _alocks[thread_id]
+
+
+@asynccontextmanager
+async def athread_lock(thread_id):
+    async with _aprocess_lock(thread_id):
+        async with async_lock_pool.connection() as conn, conn.transaction():
+            await conn.execute(NO_TIMEOUTS_SQL)
+            await conn.execute(LOCK_THREAD_SQL, (THREAD_LOCK_NAMESPACE, thread_id))
+            yield
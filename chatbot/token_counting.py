@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+# ======================================================
+# Cached Token Counting
+# ======================================================
+# Messages in a thread never change once written, so a message's token count
+# can be computed once and looked up by its id on every later turn.
+
+TOKEN_CACHE_SIZE = 20_000
+_token_cache = OrderedDict()
+_token_lock = threading.Lock()
+
+
+def count_message_tokens(message):
+    """Approximate token count of a single message, memoized by message id."""
+    key = message.id
+    if key is None:
+        return count_tokens_approximately([message])
+
+    with _token_lock:
+        tokens = _token_cache.get(key)
+        if tokens is not None:
+            _token_cache.move_to_end(key)
+            return tokens
+
+    tokens = count_tokens_approximately([message])
+    with _token_lock:
+        _token_cache[key] = tokens
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+def trim_recent_messages(messages, max_tokens):
+    """
+    Same result as trim_messages(strategy="last", start_on="human",
+    include_system=True, token_counter=count_tokens_approximately), but walks
+    backwards from the newest message and stops once the budget is spent.
+    Cost depends on the kept window, not on the length of the thread.
+    """
+    system = []
+    if messages and isinstance(messages[0], SystemMessage):
+        system = [messages[0]]
+        max_tokens -= count_message_tokens(messages[0])
+        messages = messages[1:]
+
+    # Reverse prefix sum: extend the window while it still fits
+    kept_from = len(messages)
+    total = 0
+    for i in range(len(messages) - 1, -1, -1):
+        total += count_message_tokens(messages[i])
+        if total > max_tokens:
+            break
+        kept_from = i
+
+    window = messages[kept_from:]
+    # Never open the window mid tool-exchange: start on a user message
+    for j, m in enumerate(window):
+        if isinstance(m, HumanMessage):
+            return system + window[j:]
+    return system
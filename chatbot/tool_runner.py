@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+# ======================================================
+# Parallel Tool Execution
+# ======================================================
+# Replaces ToolNode for the "tools" step: when the model asks for several tools
+# at once they all run together, so the step takes as long as the slowest call.
+# Results keep the order of the tool calls, and every call has its own timeout,
+# counted from when the call starts running.
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+
+
+def _error_message(call, error):
+    return ToolMessage(
+        content=f"Error: {error}\n Please fix your mistakes.",
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+
+class ParallelToolRunner:
+    def __init__(self, tools, max_workers=TOOL_MAX_WORKERS, timeout=TOOL_TIMEOUT, timeouts=None):
+        self.tools_by_name = {t.name: t for t in tools}
+        self.timeout = timeout
+        # Per-tool overrides, e.g. {"calculator": 1}
+        self.timeouts = timeouts or {}
+        self.max_workers = max_workers
+
+    def timeout_for(self, name):
+        return self.timeouts.get(name, self.timeout)
+
+    def _tool_calls(self, state):
+        return state["messages"][-1].tool_calls
+
+    def _invoke_one(self, call, config):
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return _error_message(call, f"{call['name']} is not a valid tool")
+        try:
+            # Invoking with a full tool call makes the tool return a ToolMessage
+            return tool.invoke({**call, "type": "tool_call"}, config)
+        except Exception as e:
+            return _error_message(call, repr(e))
+
+    def run(self, state, config: RunnableConfig):
+        """Sync graph node."""
+        calls = self._tool_calls(state)
+        if not calls:
+            return {"messages": []}
+        started = [None] * len(calls)
+
+        def invoke(i, call):
+            started[i] = time.monotonic()
+            return self._invoke_one(call, config)
+
+        # A pool per step: a hung tool keeps its thread, but only this step
+        # waits on it, never another conversation's tool calls
+        executor = ThreadPoolExecutor(max_workers=min(len(calls), self.max_workers), thread_name_prefix="tools")
+        futures = [executor.submit(invoke, i, call) for i, call in enumerate(calls)]
+        # Threads exit on their own once their call returns
+        executor.shutdown(wait=False)
+        return {"messages": [self._result(call, future, started, i)
+                             for i, (call, future) in enumerate(zip(calls, futures))]}
+
+    def _result(self, call, future, started, i):
+        timeout = self.timeout_for(call["name"])
+        while True:
+            # Calls beyond max_workers are queued; their timeout starts when they do
+            wait = timeout if started[i] is None else started[i] + timeout - time.monotonic()
+            try:
+                return future.result(timeout=max(wait, 0))
+            except FutureTimeout:
+                if started[i] is None:
+                    # Every earlier call of the step is done or timed out, so
+                    # only hung tools still hold the workers
+                    if future.cancel():
+                        return _error_message(call, "not started: the other tool calls of this step are stuck")
+                elif started[i] + timeout <= time.monotonic():
+                    # The worker thread can't be killed; its late result is dropped
+                    return _error_message(call, f"timed out after {timeout}s")
+
+    async def _ainvoke_one(self, call, config):
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return _error_message(call, f"{call['name']} is not a valid tool")
+        try:
+            return await asyncio.wait_for(
+                tool.ainvoke({**call, "type": "tool_call"}, config),
+                timeout=self.timeout_for(call["name"]),
+            )
+        except asyncio.TimeoutError:
+            return _error_message(call, f"timed out after {self.timeout_for(call['name'])}s")
+        except Exception as e:
+            return _error_message(call, repr(e))
+
+    async def arun(self, state, config: RunnableConfig):
+        """Async graph node; gather keeps results in tool-call order."""
+        calls = self._tool_calls(state)
+        results = await asyncio.gather(*(self._ainvoke_one(call, config) for call in calls))
+        return {"messages": list(results)}
@@ -0,0 +1,228 @@
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+# ======================================================
+# UI Projection of Thread Messages
+# ======================================================
+# The sidebar only needs {"role", "content"} per visible message. That
+# projection is stored per thread (thread_ui_messages) together with the
+# checkpoint id and message count it was derived from (thread_ui_state), and
+# extended with just the new messages at the end of each turn. Opening a
+# thread is then one small read with no checkpoint deserialization, and an
+# in-process copy is reused while the stored checkpoint id has not moved
+# (then only the one-row state lookup reaches the database).
+
+CREATE_PROJECTION_SQL = """
+CREATE TABLE IF NOT EXISTS thread_ui_messages (
+    thread_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (thread_id, seq)
+);
+CREATE TABLE IF NOT EXISTS thread_ui_state (
+    thread_id TEXT PRIMARY KEY,
+    checkpoint_id TEXT,
+    message_count INTEGER NOT NULL
+);
+"""
+
+# seq is the message's position in the graph's message list
+INSERT_UI_MESSAGE_SQL = """
+INSERT INTO thread_ui_messages (thread_id, seq, role, content)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (thread_id, seq) DO UPDATE SET role = EXCLUDED.role, content = EXCLUDED.content
+"""
+
+UPSERT_UI_STATE_SQL = """
+INSERT INTO thread_ui_state (thread_id, checkpoint_id, message_count)
+VALUES (%s, %s, %s)
+ON CONFLICT (thread_id) DO UPDATE SET
+    checkpoint_id = EXCLUDED.checkpoint_id,
+    message_count = EXCLUDED.message_count
+"""
+
+SELECT_UI_STATE_SQL = "SELECT checkpoint_id, message_count FROM thread_ui_state WHERE thread_id = %s"
+
+# Read only when the in-process copy is missing or stale
+SELECT_UI_MESSAGES_SQL = """
+SELECT role, content FROM thread_ui_messages
+WHERE thread_id = %s AND seq < %s
+ORDER BY seq
+"""
+
+PROJECTION_CACHE_THREADS = 128
+# thread_id -> (checkpoint_id, message_count, ui_messages)
+_projection_cache = OrderedDict()
+_projection_lock = threading.Lock()
+
+
+def format_msg(content):
+    """
+    CLEANER FUNCTION:
+    - Handles standard strings.
+    - Handles Gemini's list of dicts [{'type': 'text', 'text': ...}].
+    """
+    if isinstance(content, str):
+        return content
+    elif isinstance(content, list):
+        # Extract text from the messy list
+        text_parts = []
+        for item in content:
+            if isinstance(item, str):
+                text_parts.append(item)
+            elif isinstance(item, dict):
+                if "text" in item:
+                    text_parts.append(item["text"])
+        return "".join(text_parts)
+    return ""
+
+
+def project_message(m):
+    """The {"role", "content"} the UI shows for one message, or None if hidden."""
+    # 1. Skip technical ToolMessages
+    if isinstance(m, ToolMessage):
+        return None
+
+    # 2. Skip empty tool calls
+    if isinstance(m, AIMessage) and m.tool_calls and not m.content:
+        return None
+
+    role = "user" if isinstance(m, HumanMessage) else "assistant"
+
+    # 3. Clean the content
+    clean_content = format_msg(m.content)
+    if not clean_content:
+        return None
+    return {"role": role, "content": clean_content}
+
+
+def to_ui_messages(messages):
+    """Project graph messages to the {"role", "content"} dicts the UI renders."""
+    return [p for p in map(project_message, messages) if p is not None]
+
+
+def _cached(thread_id):
+    with _projection_lock:
+        entry = _projection_cache.get(thread_id)
+        if entry is not None:
+            _projection_cache.move_to_end(thread_id)
+        return entry
+
+
+def _remember(thread_id, checkpoint_id, message_count, ui_messages):
+    with _projection_lock:
+        _projection_cache[thread_id] = (checkpoint_id, message_count, ui_messages)
+        _projection_cache.move_to_end(thread_id)
+        while len(_projection_cache) > PROJECTION_CACHE_THREADS:
+            _projection_cache.popitem(last=False)
+
+
+def setup_ui_projection(pool):
+    with pool.connection() as conn:
+        conn.execute(CREATE_PROJECTION_SQL)
+
+
+def update_projection(pool, thread_id, messages, checkpoint_id, start=None):
+    """
+    Extend a thread's projection with messages[start:].
+    `start` defaults to the stored message count, so only new messages are formatted.
+    """
+    cached = _cached(thread_id)
+    if start is None:
+        if cached is not None:
+            start = cached[1]
+        else:
+            with pool.connection() as conn:
+                row = conn.execute(SELECT_UI_STATE_SQL, (thread_id,)).fetchone()
+            start = row["message_count"] if row else 0
+    start = min(start, len(messages))
+
+    rows = []
+    for seq in range(start, len(messages)):
+        projected = project_message(messages[seq])
+        if projected is not None:
+            rows.append((thread_id, seq, projected["role"], projected["content"]))
+
+    with pool.connection() as conn, conn.transaction():
+        if rows:
+            conn.cursor().executemany(INSERT_UI_MESSAGE_SQL, rows)
+        conn.execute(UPSERT_UI_STATE_SQL, (thread_id, checkpoint_id, len(messages)))
+
+    if cached is not None and cached[1] == start:
+        new_ui = [{"role": role, "content": content} for _, _, role, content in rows]
+        _remember(thread_id, checkpoint_id, len(messages), cached[2] + new_ui)
+
+
+def load_projection(pool, thread_id):
+    """
+    UI messages for a thread, or None when no projection has been stored yet.
+    Served from memory when the stored checkpoint id matches the cached one.
+    """
+    with pool.connection() as conn:
+        state = conn.execute(SELECT_UI_STATE_SQL, (thread_id,)).fetchone()
+        if state is None:
+            return None
+        checkpoint_id, message_count = state["checkpoint_id"], state["message_count"]
+        cached = _cached(thread_id)
+        if cached is not None and cached[0] == checkpoint_id and cached[1] == message_count:
+            return list(cached[2])
+        rows = conn.execute(SELECT_UI_MESSAGES_SQL, (thread_id, message_count)).fetchall()
+
+    ui_messages = [{"role": r["role"], "content": r["content"]} for r in rows]
+    _remember(thread_id, checkpoint_id, message_count, ui_messages)
+    return list(ui_messages)
+
+
+# ======================================================
+# Async variants (used by async_chatbot.py)
+# ======================================================
+
+async def asetup_ui_projection(async_pool):
+    async with async_pool.connection() as conn:
+        await conn.execute(CREATE_PROJECTION_SQL)
+
+
+async def aupdate_projection(async_pool, thread_id, messages, checkpoint_id, start=None):
+    cached = _cached(thread_id)
+    if start is None:
+        if cached is not None:
+            start = cached[1]
+        else:
+            async with async_pool.connection() as conn:
+                row = await (await conn.execute(SELECT_UI_STATE_SQL, (thread_id,))).fetchone()
+            start = row["message_count"] if row else 0
+    start = min(start, len(messages))
+
+    rows = []
+    for seq in range(start, len(messages)):
+        projected = project_message(messages[seq])
+        if projected is not None:
+            rows.append((thread_id, seq, projected["role"], projected["content"]))
+
+    async with async_pool.connection() as conn, conn.transaction():
+        if rows:
+            await conn.cursor().executemany(INSERT_UI_MESSAGE_SQL, rows)
+        await conn.execute(UPSERT_UI_STATE_SQL, (thread_id, checkpoint_id, len(messages)))
+
+    if cached is not None and cached[1] == start:
+        new_ui = [{"role": role, "content": content} for _, _, role, content in rows]
+        _remember(thread_id, checkpoint_id, len(messages), cached[2] + new_ui)
+
+
+async def aload_projection(async_pool, thread_id):
+    async with async_pool.connection() as conn:
+        state = await (await conn.execute(SELECT_UI_STATE_SQL, (thread_id,))).fetchone()
+        if state is None:
+            return None
+        checkpoint_id, message_count = state["checkpoint_id"], state["message_count"]
+        cached = _cached(thread_id)
+        if cached is not None and cached[0] == checkpoint_id and cached[1] == message_count:
+            return list(cached[2])
+        rows = await (await conn.execute(SELECT_UI_MESSAGES_SQL, (thread_id, message_count))).fetchall()
+
+    ui_messages = [{"role": r["role"], "content": r["content"]} for r in rows]
+    _remember(thread_id, checkpoint_id, message_count, ui_messages)
+    return list(ui_messages)
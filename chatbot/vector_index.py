@@ -0,0 +1,405 @@
+import argparse
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+
+# ======================================================
+# Local Vector Index (NumPy + memory-mapped float32)
+# ======================================================
+# Retrieval over our own documents without an external vector DB.
+# One directory per index:
+#
+#   vectors.f32        L2-normalized float32 rows (n x dim), memory-mapped;
+#                      new rows are appended to the file
+#   docs.jsonl         one JSON object per row ({"text", "source", ...})
+#   meta.json          {"dim", "count", "nlist", "deleted", "created"}
+#   ivf_centroids.npy  optional IVF coarse quantizer (nlist x dim)
+#   ivf_assign.npy     cluster of every row
+#   deleted.i64        rows removed by delete() (their vectors are zeroed)
+#
+# Search is cosine similarity (dot product of normalized vectors). Without
+# IVF every row is scored, in blocks so memory stays bounded; with IVF only
+# the rows of the `nprobe` closest clusters are scored.
+
+VECTORS_FILE = "vectors.f32"
+DOCS_FILE = "docs.jsonl"
+META_FILE = "meta.json"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGN_FILE = "ivf_assign.npy"
+DELETED_FILE = "deleted.i64"
+
+# Rows scored per matrix multiply in exact search
+SEARCH_BLOCK_ROWS = 65536
+# Exact search is used below this size even when IVF is trained
+IVF_MIN_VECTORS = int(os.getenv("VECTOR_INDEX_IVF_MIN", "20000"))
+DEFAULT_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+# Candidates fetched per requested hit when search_docs() filters
+FILTER_OVERFETCH = 10
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, ids, k):
+    """Best k (ids, scores) of one query, highest score first."""
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[keep], ids[keep]
+    order = np.argsort(-scores)
+    return ids[order], scores[order]
+
+
+class VectorIndex:
+    def __init__(self, path):
+        """Open an existing index directory (see VectorIndex.create)."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def create(cls, path, dim):
+        os.makedirs(path, exist_ok=True)
+        if cls.exists(path):
+            raise FileExistsError(f"Vector index already exists at {path}")
+        open(os.path.join(path, VECTORS_FILE), "wb").close()
+        open(os.path.join(path, DOCS_FILE), "wb").close()
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump({"dim": dim, "count": 0, "nlist": 0, "deleted": 0, "created": uuid.uuid4().hex}, f)
+        return cls(path)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        with open(self._file(META_FILE)) as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dim"]
+        self._doc_offsets, self._docs_end = [], 0
+        self._scan_docs()
+        self._map()
+        self._load_deleted()
+
+    def _load_deleted(self):
+        path = self._file(DELETED_FILE)
+        self._deleted = set(np.fromfile(path, dtype=np.int64).tolist()) if os.path.exists(path) else set()
+
+    def _scan_docs(self):
+        # Byte offset of every line, so documents are read only for hits
+        with open(self._file(DOCS_FILE), "rb") as f:
+            f.seek(self._docs_end)
+            for line in f:
+                if len(self._doc_offsets) == self.meta["count"]:
+                    break
+                self._doc_offsets.append(self._docs_end)
+                self._docs_end += len(line)
+        self._meta_mtime = os.stat(self._file(META_FILE)).st_mtime_ns
+
+    def refresh(self):
+        """Pick up rows another process (the ingester) appended or deleted since we opened the index."""
+        if os.stat(self._file(META_FILE)).st_mtime_ns == self._meta_mtime:
+            return
+        with self._lock:
+            with open(self._file(META_FILE)) as f:
+                meta = json.load(f)
+            if meta["count"] < self.meta["count"] or meta.get("created") != self.created:
+                self._load()  # rebuilt from scratch
+                return
+            self.meta = meta
+            self._scan_docs()
+            self._map()
+            self._load_deleted()
+
+    def _map(self):
+        count = self.meta["count"]
+        if count:
+            vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, self.dim))
+        else:
+            vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+        ivf = None
+        if self.meta.get("nlist") and os.path.exists(self._file(CENTROIDS_FILE)):
+            centroids = np.load(self._file(CENTROIDS_FILE))
+            assign = np.load(self._file(ASSIGN_FILE))[:count]
+            # Inverted lists: row ids grouped by cluster, list c is ids[offsets[c]:offsets[c + 1]]
+            list_ids = np.argsort(assign, kind="stable")
+            ivf = (centroids, list_ids, np.searchsorted(assign[list_ids], np.arange(len(centroids) + 1)))
+        # One assignment, so a concurrent search never mixes old rows with new lists
+        self._snapshot = (vectors, ivf)
+
+    @property
+    def vectors(self):
+        return self._snapshot[0]
+
+    @property
+    def centroids(self):
+        ivf = self._snapshot[1]
+        return ivf[0] if ivf else None
+
+    def _save_meta(self):
+        tmp = self._file(META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._file(META_FILE))
+        self._meta_mtime = os.stat(self._file(META_FILE)).st_mtime_ns
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @property
+    def created(self):
+        """Identifies this build of the index: a rebuild numbers rows from 0 again."""
+        return self.meta.get("created")
+
+    def count(self):
+        """Live rows (deleted ones excluded)."""
+        self.refresh()
+        return len(self) - len(self._deleted)
+
+    # ---------- writes ----------
+
+    def add(self, vectors, docs):
+        """Append embeddings and their documents (dicts with at least "text")."""
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+        if len(vectors) != len(docs):
+            raise ValueError("vectors and docs must have the same length")
+        if not len(docs):
+            return
+        with self._lock:
+            # Write after the last committed row; meta.json is updated last, so
+            # anything past it is a torn write from a crash and is overwritten
+            with open(self._file(VECTORS_FILE), "r+b") as f:
+                f.seek(len(self) * self.dim * 4)
+                f.truncate()
+                f.write(vectors.tobytes())
+            with open(self._file(DOCS_FILE), "r+b") as f:
+                f.seek(self._docs_end)
+                f.truncate()
+                position = self._docs_end
+                for doc in docs:
+                    line = (json.dumps(doc, ensure_ascii=False) + "\n").encode("utf-8")
+                    f.write(line)
+                    self._doc_offsets.append(position)
+                    position += len(line)
+                self._docs_end = position
+            if self.centroids is not None:
+                # New rows join their nearest existing cluster; retrain when the corpus shifts
+                assign = np.concatenate([np.load(self._file(ASSIGN_FILE))[:len(self)], self._assign(vectors)])
+                np.save(self._file(ASSIGN_FILE), assign)
+            self.meta["count"] += len(docs)
+            self._save_meta()
+            self._map()
+
+    def delete(self, rows):
+        """
+        Remove rows: their vectors are zeroed in place (they can no longer
+        score) and reads skip them. Space is reclaimed only by a rebuild.
+        """
+        rows = sorted(set(rows) - self._deleted)
+        if not rows:
+            return
+        zeros = np.zeros(self.dim, dtype=np.float32).tobytes()
+        with self._lock:
+            with open(self._file(VECTORS_FILE), "r+b") as f:
+                for row in rows:
+                    f.seek(row * self.dim * 4)
+                    f.write(zeros)
+            with open(self._file(DELETED_FILE), "ab") as f:
+                f.write(np.asarray(rows, dtype=np.int64).tobytes())
+            self._deleted.update(rows)
+            self.meta["deleted"] = len(self._deleted)
+            self._save_meta()
+
+    def _assign(self, vectors, centroids=None):
+        centroids = self.centroids if centroids is None else centroids
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS])
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assign
+
+    def train_ivf(self, nlist=None, iterations=10, sample_size=None, seed=0):
+        """
+        Spherical k-means over a sample of the rows, then assign every row.
+        nlist defaults to ~sqrt(n) clusters.
+        """
+        n = len(self)
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        if n < nlist:
+            raise ValueError(f"Need at least nlist={nlist} vectors to train IVF, have {n}")
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, sample_size or max(nlist * 40, 10000))
+        sample = np.asarray(self.vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            # Per-cluster sums via sort + reduceat (np.add.at is far slower)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            nonempty = counts > 0
+            sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+            empty = counts == 0
+            # Re-seed empty clusters with random sample rows
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize(sums)
+
+        with self._lock:
+            np.save(self._file(CENTROIDS_FILE), centroids)
+            np.save(self._file(ASSIGN_FILE), self._assign(self.vectors, centroids))
+            self.meta["nlist"] = nlist
+            self._save_meta()
+            self._map()
+
+    # ---------- reads ----------
+
+    def search(self, queries, k=5, nprobe=None, exact=False):
+        """
+        Top-k rows for a batch of query embeddings.
+        Returns one list of (row, score) per query, best first.
+        """
+        queries = normalize(queries)
+        self.refresh()
+        vectors, ivf = self._snapshot
+        if not len(vectors):
+            return [[] for _ in queries]
+        k = min(k, len(vectors))
+        if ivf is not None and not exact and len(vectors) >= IVF_MIN_VECTORS:
+            return self._search_ivf(queries, k, nprobe or DEFAULT_NPROBE, vectors, ivf)
+        return self._search_exact(queries, k, vectors)
+
+    def _search_exact(self, queries, k, vectors):
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            scores = queries @ np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS]).T
+            ids = np.arange(start, start + scores.shape[1])
+            # Keep a running top-k per query across blocks
+            scores = np.concatenate([best_scores, scores], axis=1)
+            ids = np.concatenate([best_ids, np.broadcast_to(ids, (len(queries), len(ids)))], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                ids = np.take_along_axis(ids, keep, axis=1)
+            best_scores, best_ids = scores, ids
+
+        results = []
+        for ids, scores in zip(best_ids, best_scores):
+            ids, scores = _top_k(scores, ids, k)
+            results.append(list(zip(ids.tolist(), scores.tolist())))
+        return results
+
+    def _search_ivf(self, queries, k, nprobe, vectors, ivf):
+        centroids, list_ids, list_offsets = ivf
+        nprobe = min(nprobe, len(centroids))
+        coarse = queries @ centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, clusters in zip(queries, probes):
+            ids = np.concatenate([list_ids[list_offsets[c]:list_offsets[c + 1]] for c in clusters])
+            if not len(ids):
+                results.append([])
+                continue
+            # Sorted row ids read the memory map front to back
+            ids = np.sort(ids)
+            ids, scores = _top_k(np.asarray(vectors[ids]) @ query, ids, k)
+            results.append(list(zip(ids.tolist(), scores.tolist())))
+        return results
+
+    def get_doc(self, row):
+        for _, doc in self._read_docs([row]):
+            return doc
+        raise KeyError(f"Row {row} was deleted")
+
+    def _read_docs(self, rows):
+        # One open file for all the hits of a query; deleted rows are skipped
+        with open(self._file(DOCS_FILE), "rb") as f:
+            for row in rows:
+                if row in self._deleted:
+                    continue
+                f.seek(self._doc_offsets[row])
+                yield row, {"id": row, **json.loads(f.readline())}
+
+    def get_docs(self, ids, filters=None):
+        """{row: doc} for the given rows that match `filters`."""
+        return {row: doc for row, doc in self._read_docs(ids) if _matches(doc, filters)}
+
+    def iter_docs(self, after_id=-1):
+        """Documents after row `after_id` in row order, each with its "id"."""
+        self.refresh()
+        start = after_id + 1
+        if start >= len(self._doc_offsets):
+            return
+        with open(self._file(DOCS_FILE), "rb") as f:
+            f.seek(self._doc_offsets[start])
+            for row in range(start, len(self._doc_offsets)):
+                line = f.readline()
+                if row not in self._deleted:
+                    yield {"id": row, **json.loads(line)}
+
+    def missing_ids(self, ids):
+        """The rows among `ids` that were deleted or never existed."""
+        self.refresh()
+        return [row for row in ids if row in self._deleted or row >= len(self)]
+
+    def chunk_hashes(self):
+        """{source: {content hash: [rows]}} of the live documents (see ingest.py)."""
+        hashes = {}
+        for doc in self.iter_docs():
+            hashes.setdefault(doc.get("source"), {}).setdefault(doc.get("hash"), []).append(doc["id"])
+        return hashes
+
+    def search_docs(self, queries, k=5, filters=None, **kwargs):
+        """
+        Like search(), but returns the documents with "id" (row) and "score".
+        `filters` keeps documents whose fields equal the given values; the
+        index has no metadata lists, so it over-fetches and filters the hits.
+        """
+        fetch = k * FILTER_OVERFETCH if filters else k
+        results = []
+        for hits in self.search(queries, fetch, **kwargs):
+            scores = dict(hits)
+            docs = []
+            for row, doc in self._read_docs(scores):
+                if _matches(doc, filters):
+                    docs.append({**doc, "score": round(scores[row], 4)})
+                    if len(docs) == k:
+                        break
+            results.append(docs)
+        return results
+
+def _matches(doc, filters):
+    metadata = doc.get("metadata") or {}
+    return all(doc.get(key, metadata.get(key)) == value for key, value in (filters or {}).items())
+
+if __name__ == "__main__":
+    # python vector_index.py info rag_index
+    # python vector_index.py train-ivf rag_index --nlist 1024
+    parser = argparse.ArgumentParser(description="Local vector index maintenance")
+    parser.add_argument("command", choices=["info", "train-ivf"])
+    parser.add_argument("path")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    index = VectorIndex(args.path)
+    if args.command == "train-ivf":
+        index.train_ivf(nlist=args.nlist, iterations=args.iterations)
+    print({"path": args.path, "dim": index.dim, "count": len(index), "deleted": index.meta.get("deleted", 0),
+           "nlist": index.meta.get("nlist", 0)})
@@ -5,6 +5,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Shared per-node metrics when run from the repo root with PYTHONPATH=chatbot;
+# without it the script runs as before, uninstrumented
+try:
+    from graph_metrics import instrument, metrics
+except ModuleNotFoundError:
+    def instrument(graph, config=None):
+        return config
+    metrics = None
+
 class rootState(TypedDict):
     A:int
     B:int
@@ -90,6 +99,8 @@ initial_state = {
     "C":1
 }
 
-result  = workflow.invoke(initial_state)
+result  = workflow.invoke(initial_state, config=instrument("quadratic_roots"))
+if metrics is not None:
+    metrics.write_prometheus()
 print(f"Result : ",result)
 
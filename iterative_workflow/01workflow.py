@@ -8,6 +8,15 @@ from langchain.messages import SystemMessage , HumanMessage
 
 load_dotenv()
 
+# Shared per-node metrics when run from the repo root with PYTHONPATH=chatbot;
+# without it the script runs as before, uninstrumented
+try:
+    from graph_metrics import instrument, metrics
+except ModuleNotFoundError:
+    def instrument(graph, config=None):
+        return config
+    metrics = None
+
 class postState(TypedDict):
     topic:str
     tweet:str
@@ -278,6 +287,8 @@ initial_state = {
     "max_iteration":5
 }
 
-result = workflow.invoke(initial_state)
+result = workflow.invoke(initial_state, config=instrument("tweet_loop"))
+if metrics is not None:
+    metrics.write_prometheus()
 print(f"Result : ", result)
 
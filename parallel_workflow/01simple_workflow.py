@@ -5,6 +5,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Shared per-node metrics when run from the repo root with PYTHONPATH=chatbot;
+# without it the script runs as before, uninstrumented
+try:
+    from graph_metrics import instrument, metrics
+except ModuleNotFoundError:
+    def instrument(graph, config=None):
+        return config
+    metrics = None
+
 class BatsmanState(TypedDict):
     runs:int
     ball:int
@@ -67,7 +76,9 @@ initial_state ={
     'six':6
 }
 
-final_state = workflow.invoke(initial_state)
+final_state = workflow.invoke(initial_state, config=instrument("batsman_stats"))
+if metrics is not None:
+    metrics.write_prometheus()
 print(final_state['summary'])
 
 
@@ -7,6 +7,15 @@ import operator
 
 load_dotenv()
 
+# Shared per-node metrics when run from the repo root with PYTHONPATH=chatbot;
+# without it the script runs as before, uninstrumented
+try:
+    from graph_metrics import instrument, metrics
+except ModuleNotFoundError:
+    def instrument(graph, config=None):
+        return config
+    metrics = None
+
 model = ChatGoogleGenerativeAI(model='gemini-2.5-flash')
 
 
@@ -117,7 +126,9 @@ inital_state = {
     'essay':essay
     }
 
-result = workflow.invoke(inital_state)
+result = workflow.invoke(inital_state, config=instrument("essay_grader"))
+if metrics is not None:
+    metrics.write_prometheus()
 
 print(f"Result : ", result)
 
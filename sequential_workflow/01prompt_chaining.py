@@ -6,6 +6,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Shared per-node metrics when run from the repo root with PYTHONPATH=chatbot;
+# without it the script runs as before, uninstrumented
+try:
+    from graph_metrics import instrument, metrics
+except ModuleNotFoundError:
+    def instrument(graph, config=None):
+        return config
+    metrics = None
+
 model  = ChatGoogleGenerativeAI(model='gemini-2.5-flash')
 
 class blogState(TypedDict):
@@ -42,6 +51,8 @@ workflow = graph.compile()
 
 initial_state = {"title":"machine learning"}
 
-final_state = workflow.invoke(initial_state)
+final_state = workflow.invoke(initial_state, config=instrument("blog_chain"))
+if metrics is not None:
+    metrics.write_prometheus()
 
 print(f"Blog " , final_state)
\ No newline at end of file